@@ -2,9 +2,15 @@
 
 import requests
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
-
-JSON_PATH = "output.json"
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import settings
+from store import get_store, JSON_PATH, VersionConflict
+from utils import order_dt, delete_order, add_to_done_orders
+from events import get_events
 
 def get_access_token():
     try:
@@ -15,97 +21,198 @@ def get_access_token():
 
 ACCESS_TOKEN = get_access_token()
 
-def entegrabilisim_get_orders_last_24h(page=1, limit=200):
-    url = f"https://apiv2.entegrabilisim.com/order/page={page}/"
+# ---------------- Entegra API ----------------
+API_BASE = settings.API_BASE_URL or "https://apiv2.entegrabilisim.com/"
+PAGE_LIMIT = 200
+FETCH_TIMEOUT = 30
+
+_session = None
+_session_lock = threading.Lock()
+
+def _get_session():
+    # Keep-alive'lı, havuzlu ve geçici hatalarda (429/5xx) artan beklemeyle tekrar deneyen tek oturum
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                          allowed_methods=["GET"])
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(settings.FETCH_WORKERS, 1),
+                                  max_retries=retry)
+            s = requests.Session()
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            _session = s
+        return _session
+
+def _default_window():
+    now = datetime.now()
+    return now - timedelta(hours=18), now
+
+def _fetch_page(page, start_date, end_date, limit=PAGE_LIMIT):
+    # (siparişler, ham cevap) döner; hata olursa ([], None)
+    url = f"{API_BASE.rstrip('/')}/order/page={page}/"
     headers = {
-        "Authorization": f"JWT {ACCESS_TOKEN}",
+        "Authorization": f"JWT {get_access_token()}",
         "Content-Type": "application/json"
     }
-    now = datetime.now()
-    one_day_ago = now - timedelta(hours=18)
-    start_date = one_day_ago.strftime('%Y-%m-%d %H:%M:%S')
-    end_date = now.strftime('%Y-%m-%d %H:%M:%S')
     params = {
-        "start_date": start_date,
-        "end_date": end_date,
+        "start_date": start_date.strftime('%Y-%m-%d %H:%M:%S'),
+        "end_date": end_date.strftime('%Y-%m-%d %H:%M:%S'),
         "limit": limit
     }
     try:
-        resp = requests.get(url, headers=headers, params=params, timeout=30)
+        resp = _get_session().get(url, headers=headers, params=params, timeout=FETCH_TIMEOUT)
         resp.raise_for_status()
         data = resp.json()
-        return data.get("orders", [])
+        return data.get("orders", []) or [], data
     except Exception as e:
-        print(f"API sipariş çekme hatası: {e}")
-        return []
+        print(f"API sipariş çekme hatası (sayfa {page}): {e}")
+        return [], None
+
+def _page_count(data, limit):
+    # Cevapta sayfa/kayıt sayısı varsa kullan; yoksa None (sayfalar dalgalar halinde denenir)
+    for k in ("page_count", "total_pages", "pages", "last_page"):
+        if str(data.get(k, "")).isdigit():
+            return int(data[k])
+    for k in ("count", "total", "total_count"):
+        if str(data.get(k, "")).isdigit():
+            return -(-int(data[k]) // limit)
+    return None
+
+def entegrabilisim_get_orders_last_24h(page=1, limit=PAGE_LIMIT):
+    start_date, end_date = _default_window()
+    return _fetch_page(page, start_date, end_date, limit)[0]
+
+def entegrabilisim_iter_order_pages(start_date=None, end_date=None, limit=PAGE_LIMIT, workers=None, errors=None):
+    # Önce 1. sayfayı çekip sayfa sayısını öğrenir, kalan sayfaları sınırlı bir havuzla
+    # paralel çeker ve her sayfayı geldiği anda verir (sıra garanti değildir).
+    # errors listesi verilirse çekilemeyen sayfa numaraları buna eklenir.
+    if start_date is None or end_date is None:
+        start_date, end_date = _default_window()
+    workers = workers or settings.FETCH_WORKERS
+
+    def _orders(page, result):
+        orders, data = result
+        if data is None and errors is not None:
+            errors.append(page)
+        return orders
+
+    result = _fetch_page(1, start_date, end_date, limit)
+    first = _orders(1, result)
+    if first:
+        yield first
+    if len(first) < limit:
+        return
+    total = _page_count(result[1], limit)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        if total:
+            futures = {pool.submit(_fetch_page, p, start_date, end_date, limit): p for p in range(2, total + 1)}
+            for fut in as_completed(futures):
+                orders = _orders(futures[fut], fut.result())
+                if orders:
+                    yield orders
+            return
+        # Sayfa sayısı bilinmiyor: "workers" sayfalık dalgalar, kısa/boş sayfa gelene kadar
+        page = 2
+        while True:
+            futures = {pool.submit(_fetch_page, p, start_date, end_date, limit): p for p in range(page, page + workers)}
+            son = False
+            for fut in as_completed(futures):
+                orders = _orders(futures[fut], fut.result())
+                if orders:
+                    yield orders
+                if len(orders) < limit:
+                    son = True
+            if son:
+                return
+            page += workers
 
 def entegrabilisim_get_all_orders():
     all_orders = []
-    page = 1
-    while True:
-        orders = entegrabilisim_get_orders_last_24h(page=page)
-        if not orders:
-            break
+    for orders in entegrabilisim_iter_order_pages():
         all_orders.extend(orders)
-        if len(orders) < 200:
-            break
-        page += 1
     return all_orders
 
 def merge_and_save_orders(new_orders, path=JSON_PATH):
-    # Önce işlenmiş (done) sipariş no'larını al
-    try:
-        with open("done_orders.json", "r", encoding="utf-8") as f:
-            done_list = set(json.load(f)["orders"])
-    except Exception:
-        done_list = set()
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            old_data = json.load(f)
-            old_orders = old_data.get("orders", [])
-    except Exception:
-        old_orders = []
-    order_ids = {str(o.get("no") or o.get("id")) for o in old_orders}
-    # Hem eski hem yeni siparişlerde done_list'te olanları filtrele!
-    merged = [
-        o for o in (old_orders + [o for o in new_orders if str(o.get("no") or o.get("id")) not in order_ids])
-        if str(o.get("no")) not in done_list and str(o.get("order_number")) not in done_list
-    ]
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump({"orders": merged}, f, ensure_ascii=False, indent=2)
+    # İşlenmiş (done) siparişler atlanır, kayıtlı olanlar güncellenir.
+    # {"inserted": .., "updated": .., "skipped": ..} döner
+    changes = []
+    counts = get_store(path).merge_orders(new_orders, changes)
+    if changes and path == JSON_PATH:
+        get_events().record({"op": "merge",
+                             "inserted": [k for op, k in changes if op == "inserted"],
+                             "updated": [k for op, k in changes if op == "updated"]})
+    return counts
 
 def save_orders_to_json(orders, path=JSON_PATH):
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump({"orders": orders}, f, ensure_ascii=False, indent=2)
+    get_store(path).save_orders(orders)
+
+def set_collected(barcode, value, order_no=None, path=JSON_PATH):
+    # Barkoda (ve verilirse sipariş no'ya) göre sadece ilgili satırların "collected" alanını değiştirir
+    if path == JSON_PATH:
+        return get_events().set_collected(barcode, value, order_no)
+    return get_store(path).set_collected(barcode, value, order_no)
 
 def read_orders(path=JSON_PATH):
+    # Dosya yoksa boş liste; bozuk/okunamayan depo hata verir (boş liste gibi görünüp üzerine yazılmasın)
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data.get("orders", [])
-    except Exception:
+        return get_store(path).read_orders()
+    except FileNotFoundError:
         return []
 
+def update_orders(fn, path=JSON_PATH, retries=5):
+    # Oku-değiştir-yaz: fn(orders) listeyi yerinde değiştirir ya da yeni liste döner.
+    # Arada başka bir worker/uygulama yazdıysa (VersionConflict) güncel hali okunup tekrar denenir.
+    store = get_store(path)
+    for deneme in range(retries):
+        version, orders = store.read_orders_versioned()
+        result = fn(orders)
+        try:
+            store.save_orders(result if isinstance(result, list) else orders, expected_version=version)
+            return
+        except VersionConflict:
+            if deneme == retries - 1:
+                raise
+
+def _order_barcodes(order_no):
+    # Olaylarla birlikte gönderilir: toplanacaklar ekranı sadece bu ürünlerin kartlarını yeniler
+    from snapshot import get_orders_snapshot
+    o = get_orders_snapshot().by_no.get(str(order_no)) or {}
+    return sorted({str(u.get("barcode", "")) for u in o.get("order_product", []) or []})
+
+def cancel_order(order_no, path=JSON_PATH):
+    def _iptal(orders):
+        for o in orders:
+            if str(o.get("no")) == str(order_no):
+                o["store_order_status"] = "-1"
+                o["store_order_status_name"] = "İptal Edildi"
+    barcodes = _order_barcodes(order_no) if path == JSON_PATH else []
+    update_orders(_iptal, path)
+    if path == JSON_PATH:
+        get_events().record({"op": "cancel", "order_no": str(order_no), "barcodes": barcodes})
+
+def complete_order(order_no):
+    # Onayla + yazdır: sipariş listeden çıkar, tekrar gelmesin diye done listesine eklenir
+    barcodes = _order_barcodes(order_no)
+    delete_order(order_no)
+    add_to_done_orders(order_no)
+    get_events().record({"op": "complete", "order_no": str(order_no), "barcodes": barcodes})
+
 def archive_old_orders(days=30, path=JSON_PATH, archive_path="archive.json"):
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        orders = data.get("orders", [])
-    except Exception:
-        orders = []
     now = datetime.now()
-    keep, archive = [], []
-    for o in orders:
-        dt = o.get("datetime", "")
-        try:
-            tarih = datetime.strptime(dt, "%Y-%m-%d %H:%M:%S")
-            if o.get("store_order_status") == "4" and (now - tarih).days >= days:
+    archive = []
+
+    def _ayir(orders):
+        keep = []
+        archive.clear()
+        for o in orders:
+            tarih = order_dt(o)
+            if tarih and o.get("store_order_status") == "4" and (now - tarih).days >= days:
                 archive.append(o)
             else:
                 keep.append(o)
-        except:
-            keep.append(o)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump({"orders": keep}, f, ensure_ascii=False, indent=2)
+        return keep
+
+    update_orders(_ayir, path)
     with open(archive_path, "w", encoding="utf-8") as f:
         json.dump({"orders": archive}, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,62 @@
+# assets.py
+# Statik dosyalar için içerik özetli (hash) adresler ve uzun süreli önbellek başlıkları.
+# Şablonlar static_url("styles.css") ile "/static/styles.css?v=<özet>" alır; dosya değişince özet, yani adres
+# değişir. Bu yüzden güncel özetle istenen dosya "immutable" olarak bir yıl önbelleğe alınabilir;
+# özetsiz (ya da eski özetle) istenenler her seferinde doğrulanır (no-cache + ETag).
+import hashlib
+import logging
+import os
+import threading
+from typing import Dict, Optional, Set, Tuple
+
+from starlette.staticfiles import StaticFiles
+
+STATIC_DIR = "static"
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+log = logging.getLogger("assets")
+
+_hash_lock = threading.Lock()
+_hashes: Dict[str, Tuple[Tuple[int, int], str]] = {}
+_missing: Set[str] = set()
+
+
+def static_hash(path: str) -> Optional[str]:
+    # Dosya içeriğinin kısa özeti; dosya yoksa None. mtime/boyut değişmedikçe yeniden hesaplanmaz.
+    full = os.path.join(STATIC_DIR, path)
+    try:
+        st = os.stat(full)
+    except OSError:
+        return None
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _hashes.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    with open(full, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:12]
+    with _hash_lock:
+        _hashes[path] = (key, digest)
+    return digest
+
+
+def static_url(path: str) -> str:
+    digest = static_hash(path)
+    if digest is None:
+        # Şablonun andığı dosya static/ altında yok (sayfa bozuk açılır): her dosya için bir kez hata loglanır
+        if path not in _missing:
+            _missing.add(path)
+            log.error("Statik dosya bulunamadı: %s", os.path.join(STATIC_DIR, path))
+        return "/static/" + path
+    return f"/static/{path}?v={digest}"
+
+
+class CachedStaticFiles(StaticFiles):
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        path = self.get_path(scope).replace(os.sep, "/")
+        query = scope.get("query_string", b"").decode("latin-1")
+        if "v=" + (static_hash(path) or "-") in query.split("&"):
+            response.headers["Cache-Control"] = IMMUTABLE
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+        return response
@@ -0,0 +1,118 @@
+# compression.py
+# Yanıt sıkıştırma middleware'i: gzip, "brotli" paketi kuruluysa ve tarayıcı destekliyorsa br.
+# minimum_size'dan küçük yanıtlar, zaten sıkıştırılmış içerik (resim vb.) ve SSE akışı olduğu gibi gider.
+# Akış (streaming) yanıtlarında her parça ayrı flush edilir: istemci parçaları beklemeden alır.
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SKIP_TYPES = ("text/event-stream", "image/", "video/", "audio/", "font/woff", "application/zip",
+              "application/gzip", "application/octet-stream")
+
+
+class _Gzip:
+    def __init__(self, level: int):
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        return self._z.compress(data) + self._z.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class _Brotli:
+    def __init__(self, quality: int):
+        self._c = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        return self._c.process(data) + (self._c.finish() if final else self._c.flush())
+
+
+def _choose_encoding(accept: str):
+    kabul = set()
+    for part in accept.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        kabul.add(name.strip())
+    if brotli is not None and "br" in kabul:
+        return "br"
+    if "gzip" in kabul:
+        return "gzip"
+    return None
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1000, gzip_level: int = 6, brotli_quality: int = 5):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = _choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _Responder(self, encoding, send).send)
+
+    def compressor(self, encoding: str):
+        return _Brotli(self.brotli_quality) if encoding == "br" else _Gzip(self.gzip_level)
+
+
+class _Responder:
+    def __init__(self, mw: CompressionMiddleware, encoding: str, send):
+        self.mw = mw
+        self.encoding = encoding
+        self._send = send
+        self.start_message = None
+        self.compressor = None
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            # Başlıklar ilk gövde parçası görülünce (boyut belli olunca) gönderilir
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+        body = message.get("body", b"")
+        more = message.get("more_body", False)
+        if self.start_message is not None:
+            start, self.start_message = self.start_message, None
+            if not self._should_compress(Headers(raw=start["headers"]), body, more):
+                await self._send(start)
+                await self._send(message)
+                return
+            self.compressor = self.mw.compressor(self.encoding)
+            headers = MutableHeaders(raw=start["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            body = self.compressor.compress(body, not more)
+            if more:
+                if "content-length" in headers:
+                    del headers["content-length"]
+            else:
+                headers["Content-Length"] = str(len(body))
+            await self._send(start)
+            await self._send(dict(message, body=body))
+            return
+        if self.compressor is not None:
+            message = dict(message, body=self.compressor.compress(body, not more))
+        await self._send(message)
+
+    def _should_compress(self, headers: Headers, body: bytes, more: bool) -> bool:
+        if "content-encoding" in headers:
+            return False
+        ctype = headers.get("content-type", "")
+        if any(ctype.startswith(t) for t in SKIP_TYPES):
+            return False
+        if not more and len(body) < self.mw.minimum_size:
+            return False
+        return True
@@ -13,13 +13,62 @@ class Settings:
     # Database/Files
     OUTPUT_JSON: str = os.getenv("OUTPUT_JSON", "output.json")
     LOCATIONS_CSV: str = os.getenv("LOCATIONS_CSV", "locations.csv")
+    LOCATIONS_JSON: str = os.getenv("LOCATIONS_JSON", "locations.json")
+    # Depo yerleri (bkz. locations.py); CSV/JSON sadece ilk açılışta buraya aktarılır
+    LOCATIONS_DB: str = os.getenv("LOCATIONS_DB", "locations.db")
+    # Toplu depo yeri aktarmada bir işlemde (transaction) yazılan satır sayısı
+    LOCATIONS_IMPORT_BATCH: int = int(os.getenv("LOCATIONS_IMPORT_BATCH", "2000"))
+    # Rota modunda bir toplama turunun (sepetin) alabileceği ürün adedi; 0 = bölme
+    PICK_CART_CAPACITY: int = int(os.getenv("PICK_CART_CAPACITY", "0"))
     TOKEN_PATH: str = os.getenv("TOKEN_PATH", "token.txt")
+    DONE_JSON: str = os.getenv("DONE_JSON", "done_orders.json")
+
+    # Sipariş deposu: "json" (output.json) veya "sqlite"
+    ORDER_STORE: str = os.getenv("ORDER_STORE", "json").lower()
+    ORDER_DB: str = os.getenv("ORDER_DB", "orders.db")
     
     # Security
     SECRET_KEY: Optional[str] = os.getenv("SECRET_KEY")
     
     # API URLs
     API_BASE_URL: str = os.getenv("API_BASE_URL", "")
+    FETCH_WORKERS: int = int(os.getenv("FETCH_WORKERS", "4"))
+
+    # server.py'de olay döngüsü dışına alınan engelleyici işler için iş parçacığı sınırları
+    IO_THREADS: int = int(os.getenv("IO_THREADS", "16"))
+    NET_THREADS: int = int(os.getenv("NET_THREADS", "2"))
+
+    # Artımlı senkronizasyon
+    SYNC_STATE: str = os.getenv("SYNC_STATE", "sync_state.json")
+    SYNC_OVERLAP_MINUTES: int = int(os.getenv("SYNC_OVERLAP_MINUTES", "15"))
+    SYNC_CHUNK_HOURS: int = int(os.getenv("SYNC_CHUNK_HOURS", "24"))
+    SYNC_MAX_BACKFILL_DAYS: int = int(os.getenv("SYNC_MAX_BACKFILL_DAYS", "7"))
+
+    # Web sunucusu içi arka plan senkronizasyonu (0 = kapalı)
+    SYNC_INTERVAL_SECONDS: int = int(os.getenv("SYNC_INTERVAL_SECONDS", "1800"))
+    SYNC_JITTER_SECONDS: int = int(os.getenv("SYNC_JITTER_SECONDS", "60"))
+    SYNC_LOCK: str = os.getenv("SYNC_LOCK", "sync.lock")
+
+    # Sipariş olay günlüğü (bkz. events.py)
+    EVENT_JOURNAL: str = os.getenv("EVENT_JOURNAL", "events.jsonl")
+    EVENT_KEEP: int = int(os.getenv("EVENT_KEEP", "1000"))
+    EVENT_COMPACT_BYTES: int = int(os.getenv("EVENT_COMPACT_BYTES", "1000000"))
+    # "Toplandı" işaretleri için yazma-arkası modu: işaretler günlüğe eklenir, depoya toplu yazılır
+    WRITE_BEHIND: bool = os.getenv("WRITE_BEHIND", "False").lower() == "true"
+    WRITE_BEHIND_INTERVAL: float = float(os.getenv("WRITE_BEHIND_INTERVAL", "2"))
+    WRITE_BEHIND_MAX_BATCH: int = int(os.getenv("WRITE_BEHIND_MAX_BATCH", "100"))
+
+    # Sipariş listesinde bir sayfadaki kart sayısı (sonraki sayfalar kaydırdıkça yüklenir)
+    ORDERS_PAGE_SIZE: int = int(os.getenv("ORDERS_PAGE_SIZE", "50"))
+    # Render edilmiş kart önbelleğinin boyutu (kart sayısı, 0 = kapalı)
+    FRAGMENT_CACHE_SIZE: int = int(os.getenv("FRAGMENT_CACHE_SIZE", "5000"))
+    # Bu boyuttan (bayt) küçük yanıtlar sıkıştırılmaz
+    COMPRESS_MIN_SIZE: int = int(os.getenv("COMPRESS_MIN_SIZE", "1000"))
+
+    # Ürün resimlerinin küçük resim önbelleği (bkz. thumbs.py)
+    THUMB_DIR: str = os.getenv("THUMB_DIR", "thumbs")
+    THUMB_SIZE: int = int(os.getenv("THUMB_SIZE", "170"))
+    THUMB_MEM_ITEMS: int = int(os.getenv("THUMB_MEM_ITEMS", "256"))
     
     @property
     def is_production(self) -> bool:
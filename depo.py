@@ -1,114 +1,51 @@
 import tkinter as tk
 from tkinter import ttk
-from api import read_orders
-from utils import unique_list, calc_days_ago
-import requests
+from picklist import normalize_platform
+from snapshot import get_orders_snapshot
+from utils import parse_filter_date
 import io
+import queue
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image, ImageTk
-from datetime import datetime
+from config import settings
+from thumbs import get_thumbs
+from locations import get_locations_store
+from route import route_sort, split_batches
 
-IMG_CACHE = {}
-
-def normalize_platform(plat):
-    plat = (plat or "").strip().lower()
-    if "trendyol" in plat:
-        return "trendyol"
-    if "hepsiburada" in plat:
-        return "hepsiburada"
-    if "amazon" in plat:
-        return "amazon"
-    if "n11" in plat:
-        return "n11"
-    if "ciceksepeti" in plat:
-        return "ciceksepeti"
-    if "pazarama" in plat:
-        return "pazarama"
-    if "idefix" in plat:
-        return "idefix"
-    return plat
-
-def get_depo_urunler(siparisler, platform_filter=None, date_start=None, date_end=None, arama_terimi=None):
-    gruplu = {}
-    for order in siparisler:
-        durum = (order.get("store_order_status_name", "") or "").lower()
-        kargoya_verildi_kelimeleri = [
-            "tamamlandı", "teslim edildi", "iptal", "iptal edildi"
-        ]
-        if any(anahtar in durum for anahtar in kargoya_verildi_kelimeleri):
-            continue
-        if platform_filter and platform_filter.strip().upper() != "TÜMÜ":
-            order_platform = normalize_platform(order.get("entegration", "")).upper()
-            if order_platform != platform_filter.strip().upper():
-                continue
-        tarih = order.get("datetime", "")
-        try:
-            order_dt = datetime.strptime(tarih, "%Y-%m-%d %H:%M:%S")
-            if date_start and order_dt < date_start:
-                continue
-            if date_end and order_dt > date_end:
-                continue
-        except:
-            pass
-        for urun in order.get("order_product", []):
-            key = (urun.get("name", ""), urun.get("barcode", ""))
-            if key not in gruplu:
-                gruplu[key] = {
-                    "name": urun.get("name", ""),
-                    "barcode": urun.get("barcode", ""),
-                    "stock_code": urun.get("store_stock_code", ""),
-                    "picture": urun.get("picture", ""),
-                    "adet": 0,
-                    "days_ago": calc_days_ago(tarih),
-                    "orders": [],
-                    "platformlar": {},
-                }
-            gruplu[key]["adet"] += int(urun.get("quantity", 1))
-            gruplu[key]["orders"].append((order, urun))
-            if gruplu[key]["days_ago"] > calc_days_ago(tarih):
-                gruplu[key]["days_ago"] = calc_days_ago(tarih)
-            platform = normalize_platform(order.get("entegration", "")).upper()
-            siparis_no = order.get("order_number", order.get("order_no", order.get("id", "")))
-            if platform:
-                if platform not in gruplu[key]["platformlar"]:
-                    gruplu[key]["platformlar"][platform] = []
-                gruplu[key]["platformlar"][platform].append({
-                    "adet": int(urun.get("quantity", 1)),
-                    "siparis_no": siparis_no
-                })
-    urunler = list(gruplu.values())
-    urunler.sort(key=lambda u: u.get("name", "").lower())
-    if arama_terimi:
-        at = arama_terimi.lower()
-        def match(u):
-            return (
-                at in (u["name"] or "").lower()
-                or at in (u["barcode"] or "").lower()
-                or at in (u["stock_code"] or "").lower()
-            )
-        urunler = [u for u in urunler if match(u)]
-    return urunler
+# Küçük resimler arka planda (thumbs.py önbelleği üzerinden) yüklenir; kart önce yer tutucuyla çizilir.
+# PhotoImage'lar sadece arayüz iş parçacığında oluşturulur, son kullanılan IMG_CACHE_MAX tanesi tutulur.
+IMG_CACHE = OrderedDict()
+IMG_CACHE_MAX = 300
+IMG_HAVUZU = ThreadPoolExecutor(max_workers=4, thread_name_prefix="resim")
 
 def kisa_ad(ad, maxlen=46):
     return ad[:maxlen] + "..." if len(ad) > maxlen else ad
 
 class DepoPencere(tk.Toplevel):
-    def __init__(self, ana_root, set_collected_func, get_depo_urunler_func):
+    def __init__(self, ana_root, set_collected_func, query_picklist_func):
         super().__init__(ana_root)
         self.set_collected_func = set_collected_func
-        self.get_depo_urunler = get_depo_urunler_func
+        # (platform, tarih1, tarih2, arama) -> ürün listesi; bkz. snapshot.query_picklist
+        self.query_picklist = query_picklist_func
 
         self.title("Depodan Toplanacaklar")
         self.geometry("1350x900")
         self.config(bg="#F3F4F6")
         self.resizable(True, True)
         self.urun_gorseller = {}
+        self._resim_kuyrugu = queue.Queue()
+        self._bekleyen_resimler = {}  # url -> bu resmi bekleyen etiketler
+        self._placeholder = None
 
-        tum_platformlar = [normalize_platform(o.get("entegration","")).upper() for o in read_orders() if o.get("entegration","")]
+        tum_platformlar = [normalize_platform(o.get("entegration","")).upper() for o in get_orders_snapshot().orders if o.get("entegration","")]
         platformlar = ["TÜMÜ"] + sorted(list({p for p in tum_platformlar if p}))
         self.platform_var = tk.StringVar(value="TÜMÜ")
         self.tarih1 = tk.StringVar()
         self.tarih2 = tk.StringVar()
         self.search_var = tk.StringVar()
+        self.sirala_var = tk.StringVar(value="Ürün adı")
+        self.sepet_var = tk.StringVar(value=str(settings.PICK_CART_CAPACITY or ""))
 
         # Üst filtre barı
         filtre_frame = tk.Frame(self, bg="#e0eaff", bd=0)
@@ -130,6 +67,16 @@ class DepoPencere(tk.Toplevel):
         search_entry.pack(side="left", padx=(2,2))
         tk.Button(search_frame, text="Ara", command=self.guncelle, bg="#0ea5e9", fg="#fff", font=("Arial", 11, "bold"), relief="flat", padx=7).pack(side="left", padx=7)
         search_entry.bind("<Return>", lambda e: self.guncelle())
+        # Toplama rotası: depo yerine göre yürüme sırası, sepet adedi verilirse turlara bölünmüş (bkz. route.py)
+        tk.Label(search_frame, text="Sıralama:", bg="#e0eaff", font=("Arial", 12)).pack(side="left", padx=(18,2))
+        cmb_sirala = ttk.Combobox(search_frame, values=["Ürün adı", "Toplama rotası"], textvariable=self.sirala_var,
+                                  width=14, state="readonly", font=("Arial", 12))
+        cmb_sirala.pack(side="left", padx=4, ipady=2)
+        cmb_sirala.bind("<<ComboboxSelected>>", lambda e: self.guncelle())
+        tk.Label(search_frame, text="Sepet (adet):", bg="#e0eaff", font=("Arial", 12)).pack(side="left", padx=(12,2))
+        sepet_entry = tk.Entry(search_frame, textvariable=self.sepet_var, width=6, font=("Arial", 12))
+        sepet_entry.pack(side="left", padx=2)
+        sepet_entry.bind("<Return>", lambda e: self.guncelle())
 
         # Canvas+Frame+Scroll
         self.canvas = tk.Canvas(self, bg="#F3F4F6", borderwidth=0, highlightthickness=0)
@@ -149,6 +96,7 @@ class DepoPencere(tk.Toplevel):
         self.bind("<Leave>", lambda e: self._deactivate_mousewheel())
 
         self.guncelle()
+        self._resimleri_isle()
 
     def _activate_mousewheel(self):
         self.bind_all("<MouseWheel>", self._on_mousewheel)
@@ -160,24 +108,56 @@ class DepoPencere(tk.Toplevel):
         self.canvas.yview_scroll(int(-1*(event.delta/120)), "units")
 
     def get_img(self, url):
+        # Önbellekteyse resim, değilse yer tutucu (resim gelince _resimleri_isle etiketi günceller)
+        if url and url in IMG_CACHE:
+            IMG_CACHE.move_to_end(url)
+            return IMG_CACHE[url], False
+        if self._placeholder is None:
+            _digest, data = get_thumbs().placeholder(settings.THUMB_SIZE)
+            im = Image.open(io.BytesIO(data))
+            im.thumbnail((settings.THUMB_SIZE, settings.THUMB_SIZE))
+            self._placeholder = ImageTk.PhotoImage(im)
         if not url:
-            url = "https://cdn-icons-png.flaticon.com/512/10148/10148616.png"
-        if url in IMG_CACHE:
-            return IMG_CACHE[url]
+            return self._placeholder, False
+        if url not in self._bekleyen_resimler:
+            self._bekleyen_resimler[url] = []
+            IMG_HAVUZU.submit(self._resim_yukle, url)
+        return self._placeholder, True
+
+    def _resim_yukle(self, url):
+        # Arka plan iş parçacığı: indir / diskten oku, çöz; Tk nesnesi oluşturmaz
         try:
-            resp = requests.get(url, timeout=3)
-            im = Image.open(io.BytesIO(resp.content))
-            im.thumbnail((170,170))
-            photo = ImageTk.PhotoImage(im)
-            IMG_CACHE[url] = photo
-            return photo
-        except:
-            resp = requests.get("https://cdn-icons-png.flaticon.com/512/10148/10148616.png")
-            im = Image.open(io.BytesIO(resp.content))
-            im.thumbnail((150,150))
+            hit = get_thumbs().get(url, settings.THUMB_SIZE)
+            im = None
+            if hit is not None:
+                im = Image.open(io.BytesIO(hit[1]))
+                im.load()
+                # Önbellek boyutları kovalara yuvarlar (bkz. thumbs.bucket_size); kart THUMB_SIZE'da çizilir
+                im.thumbnail((settings.THUMB_SIZE, settings.THUMB_SIZE))
+        except Exception:
+            im = None
+        self._resim_kuyrugu.put((url, im))
+
+    def _resimleri_isle(self):
+        if not self.winfo_exists():
+            return
+        while True:
+            try:
+                url, im = self._resim_kuyrugu.get_nowait()
+            except queue.Empty:
+                break
+            etiketler = self._bekleyen_resimler.pop(url, [])
+            if im is None:
+                continue
             photo = ImageTk.PhotoImage(im)
             IMG_CACHE[url] = photo
-            return photo
+            while len(IMG_CACHE) > IMG_CACHE_MAX:
+                IMG_CACHE.popitem(last=False)
+            for lbl in etiketler:
+                if lbl.winfo_exists():
+                    lbl.configure(image=photo)
+                    lbl.image = photo
+        self.after(50, self._resimleri_isle)
 
     def urun_platform_popup(self, urun):
         popup = tk.Toplevel(self)
@@ -202,24 +182,35 @@ class DepoPencere(tk.Toplevel):
             w.destroy()
         t1 = self.tarih1.get().strip()
         t2 = self.tarih2.get().strip()
-        try:
-            d1 = datetime.strptime(t1, "%d.%m.%Y") if t1 else None
-        except:
-            d1 = None
-        try:
-            d2 = datetime.strptime(t2, "%d.%m.%Y") if t2 else None
-        except:
-            d2 = None
+        d1 = parse_filter_date(t1)
+        d2 = parse_filter_date(t2, end_of_day=True)
         platform = self.platform_var.get()
         arama_terimi = self.search_var.get().strip()
-        tum_urunler = self.get_depo_urunler(read_orders(), platform, d1, d2, arama_terimi)
+        tum_urunler = self.query_picklist(platform, d1, d2, arama_terimi)
         urunler = [u for u in tum_urunler if not self.is_checked(u)]
+        yer = get_locations_store().lookup()
+        for u in urunler:
+            u["depo_yeri"] = yer(u.get("name", ""))
+        rota = self.sirala_var.get() == "Toplama rotası"
+        if rota:
+            sepet = self.sepet_var.get().strip()
+            turlar = split_batches(route_sort(urunler, lambda u: u["depo_yeri"]), int(sepet) if sepet.isdigit() else 0)
+            urunler = [u for tur in turlar for u in tur]
+            tur_basi = {id(tur[0]): (n, tur) for n, tur in enumerate(turlar, 1)} if len(turlar) > 1 else {}
         self.vars = []
         self.urunler_list = urunler
 
+        satir = 0
         for i, u in enumerate(urunler):
+            if rota and id(u) in tur_basi:
+                n, tur = tur_basi[id(u)]
+                tk.Label(self.urun_frame, text=f"Sepet {n} / {len(turlar)}  ·  {len(tur)} ürün, {sum(x['adet'] for x in tur)} adet",
+                         bg="#1e3a8a", fg="#fff", font=("Arial", 14, "bold"), anchor="w", padx=14, pady=6
+                         ).grid(row=satir, column=0, sticky="ew", padx=22, pady=(18,0))
+                satir += 1
             card = tk.Frame(self.urun_frame, bg="#fff", bd=0, highlightbackground="#e0e7ef", highlightthickness=3)
-            card.grid(row=i, column=0, sticky="ew", padx=22, pady=18)
+            card.grid(row=satir, column=0, sticky="ew", padx=22, pady=18)
+            satir += 1
             card.grid_propagate(False)
             card.config(width=1000, height=185)
             card.columnconfigure(1, weight=1)
@@ -229,16 +220,20 @@ class DepoPencere(tk.Toplevel):
             # Görsel (büyütülmüş)
             img_frame = tk.Frame(card, bg="#E0E7FF", width=170, height=170)
             img_frame.grid(row=0, column=0, rowspan=3, padx=(18,12), pady=(18,12), sticky="w")
-            img = self.get_img(u["picture"])
+            img, bekliyor = self.get_img(u["picture"])
             img_label = tk.Label(img_frame, image=img, bg="#E0E7FF", width=160, height=160, cursor="hand2")
             img_label.image = img
             img_label.pack()
+            if bekliyor:
+                self._bekleyen_resimler[u["picture"]].append(img_label)
             img_label.bind("<Button-1>", lambda e, urun=u: self.urun_platform_popup(urun))
 
             # Bilgiler
             name_lbl = tk.Label(card, text=kisa_ad(u.get("name", "")), bg="#fff", fg="#1e293b", font=("Arial", 17, "bold"))
             name_lbl.grid(row=0, column=1, sticky="w", pady=(26,0))
-            info_lbl = tk.Label(card, text=f"Stok: {u.get('stock_code', '')}   Barkod: {u.get('barcode', '')}",
+            yer_txt = f"   Yer: {u['depo_yeri']}" if u.get("depo_yeri") else ""
+            sira_txt = f"#{u['rota_sira']}  " if rota else ""
+            info_lbl = tk.Label(card, text=f"{sira_txt}Stok: {u.get('stock_code', '')}   Barkod: {u.get('barcode', '')}{yer_txt}",
                                 bg="#fff", fg="#64748b", font=("Arial", 12))
             info_lbl.grid(row=1, column=1, sticky="w", pady=(10,0))
 
@@ -299,10 +294,7 @@ class DepoPencere(tk.Toplevel):
         )
 
     def is_checked(self, urun):
-        for order, urundict in urun["orders"]:
-            if not urundict.get("collected", False):
-                return False
-        return True
+        return urun["_collected"]
 
     def check_and_save(self, urun, var):
         self.set_collected_func(urun["barcode"], var.get())
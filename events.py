@@ -0,0 +1,168 @@
+# events.py
+# Sipariş değişikliklerinin olay günlüğü (events.jsonl, bkz. journal.py).
+# Her değişiklik (toplandı işareti, iptal, onay/tamamlama, API'den birleştirme) günlüğe tek satır olarak eklenir;
+# masaüstü uygulaması ve web sunucusu tail() ile sadece yeni olayları okur, her şeyi yeniden okumaz.
+#
+# Olaylar:
+#   {"op": "collected", "barcode", "value", "order_no"}   toplandı işareti
+#   {"op": "cancel", "order_no", "barcodes"}              iptal
+#   {"op": "complete", "order_no", "barcodes"}            onaylandı (listeden çıktı, done'a eklendi)
+#   {"op": "merge", "inserted": [..], "updated": [..]}    API'den gelen siparişler
+# "applied": true olan olaylar depoya zaten yazılmıştır. Yazma-arkası modunda (settings.WRITE_BEHIND)
+# toplandı işaretleri depoya yazılmadan önce günlüğe eklenir (O(1), fsync'li) ve bellekteki görüntüye uygulanır;
+# arka plandaki sıkıştırma (compact) bunları WRITE_BEHIND_INTERVAL saniyede bir ya da WRITE_BEHIND_MAX_BATCH
+# işarette bir, tek yazmada depoya işler. Süreç çökerse işlenmemiş olaylar açılışta depoya işlenir (replay).
+# Sıkıştırma günlüğün son EVENT_KEEP olayını tutar ki geride kalan okuyucular kaldıkları yerden devam edebilsin.
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from config import settings
+from journal import Cursor, Journal
+from snapshot import apply_collected, count_collected_changes, set_overlay_journal
+from store import get_store
+
+log = logging.getLogger("events")
+
+
+class OrderEvents:
+    def __init__(self, journal_path: str = None, write_behind: bool = None, interval: float = None,
+                 max_batch: int = None, keep: int = None, compact_bytes: int = None):
+        self.journal = Journal(journal_path or settings.EVENT_JOURNAL)
+        self.write_behind = settings.WRITE_BEHIND if write_behind is None else write_behind
+        self.interval = settings.WRITE_BEHIND_INTERVAL if interval is None else interval
+        self.max_batch = settings.WRITE_BEHIND_MAX_BATCH if max_batch is None else max_batch
+        self.keep = settings.EVENT_KEEP if keep is None else keep
+        self.compact_bytes = settings.EVENT_COMPACT_BYTES if compact_bytes is None else compact_bytes
+        self._pending = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        if self.write_behind:
+            # Görüntü, depoya henüz yazılmamış işaretleri günlükten okuyup uygular
+            set_overlay_journal(self.journal)
+
+    # ---------------- Olay kaydı ----------------
+    def set_collected(self, barcode, value: bool, order_no=None) -> int:
+        event = {"op": "collected", "barcode": str(barcode), "value": bool(value),
+                 "order_no": str(order_no) if order_no else None}
+        if not self.write_behind:
+            changed = get_store().set_collected(barcode, value, order_no)
+            if changed:
+                self.record(event)
+            return changed
+        # Değişen satır sayısı kayıttan önce sayılır: kayıt eklendikten sonra görüntü onu günlükten
+        # kendisi uygular (overlay), apply_collected'ın sayacı hep 0 çıkardı
+        changed = count_collected_changes(barcode, bool(value), order_no)
+        if not changed:
+            return 0
+        self.journal.append([dict(event, applied=False)])
+        apply_collected(barcode, bool(value), order_no)
+        self.start()
+        with self._lock:
+            self._pending += 1
+            if self._pending >= self.max_batch:
+                self._wake.set()
+        return changed
+
+    def record(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        # Depoya yazılmış bir değişikliği bildirir (önce depo, sonra olay: olayı gören depoda da görür)
+        return self.journal.append([dict(event, applied=True)])[0]
+
+    def tail(self, cursor: Cursor = None):
+        # (yeni olaylar, yeni cursor); cursor None ise günlükteki tüm olaylar
+        return self.journal.read_from(cursor)
+
+    def cursor(self) -> Cursor:
+        # Şu anki sona işaret eden cursor (sadece bundan sonraki olaylar istenirse)
+        return self.journal.read_from(None)[1]
+
+    # ---------------- Sıkıştırma ----------------
+    def compact(self, replay: bool = False) -> int:
+        # İşlenmemiş olaylar sırayla depoya işlenir (toplandı işaretleri tek yazmada), günlük son "keep"
+        # olaya indirilir. Olaylar "değeri ata" biçiminde olduğundan iki kez işlenmeleri zararsızdır.
+        # replay=True: yazma-arkası kapalı olsa da (ör. mod sonradan kapatıldıysa) işlenmemiş olaylara bakılır
+        if not (self.write_behind or replay) and not self._oversized():
+            return 0
+        with self.journal.lock():
+            records = self.journal.read_all()
+            pending = [r for r in records if not r.get("applied", True)]
+            if not pending and not self._oversized():
+                return 0
+            changes = [(r["barcode"], r["value"], r.get("order_no")) for r in pending if r.get("op") == "collected"]
+            if changes:
+                get_store().set_collected_many(changes)
+            self.journal._compact_locked(self.keep, self._trim)
+        with self._lock:
+            self._pending = 0
+        return len(pending)
+
+    def _oversized(self) -> bool:
+        return self.compact_bytes > 0 and _size(self.journal.path) >= self.compact_bytes
+
+    def _trim(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # Tutulan olaylar işlenmiş sayılır; toplamları EVENT_COMPACT_BYTES'ın yarısını geçmez
+        # (büyük "merge" olayları yüzünden her turda yeniden sıkıştırma yapılmasın)
+        out, total = [], 0
+        for r in reversed(records):
+            r = dict(r, applied=True)
+            total += len(json.dumps(r, ensure_ascii=False))
+            if self.compact_bytes > 0 and total > self.compact_bytes // 2:
+                break
+            out.append(r)
+        out.reverse()
+        return out
+
+    # ---------------- Arka plan ----------------
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="events", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        # Bekleyen her şeyi yazıp durur
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            self._wake.set()
+            thread.join()
+        self.compact()
+
+    def _run(self):
+        # İlk tur hemen: önceki bir çökmeden kalan işlenmemiş olaylar varsa depoya işlenir (replay)
+        replay = True
+        while True:
+            try:
+                self.compact(replay)
+                replay = False
+            except Exception:
+                log.exception("Olay günlüğü depoya işlenemedi, sonraki turda tekrar denenecek")
+            if self._stop.is_set():
+                return
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+
+def _size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+_instance: Optional[OrderEvents] = None
+_instance_lock = threading.Lock()
+
+
+def get_events() -> OrderEvents:
+    global _instance
+    with _instance_lock:
+        if _instance is None:
+            _instance = OrderEvents()
+        return _instance
@@ -0,0 +1,45 @@
+# fragments.py
+# Render edilmiş kart parçalarının (sipariş / ürün kartı HTML'i) LRU önbelleği.
+# Anahtar, kartta görünen her şeyi içerir (alanlar + renk/gün rozeti gibi zamana bağlı değerler);
+# alan değişince anahtar da değişir, eski parça kullanılmadıkça LRU ile düşer. Bu yüzden silme gerekmez.
+# Sayfa önbellekteki parçalardan birleştirilir: sadece değişen kartlar yeniden render edilir.
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+from markupsafe import Markup
+
+
+class FragmentCache:
+    def __init__(self, maxsize: int = 5000):
+        self.maxsize = maxsize
+        self._items: "OrderedDict[Hashable, Markup]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, render: Callable[[], str]) -> Markup:
+        with self._lock:
+            html = self._items.get(key)
+            if html is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return html
+            self.misses += 1
+        # Render kilit dışında; aynı kart iki istekte birden render edilirse sonuç aynıdır
+        html = Markup(render())
+        if self.maxsize > 0:
+            with self._lock:
+                self._items[key] = html
+                self._items.move_to_end(key)
+                while len(self._items) > self.maxsize:
+                    self._items.popitem(last=False)
+        return html
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._items), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
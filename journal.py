@@ -0,0 +1,144 @@
+# journal.py
+# Satır bazlı (JSONL), sadece sona eklenen kalıcı günlük.
+# Her kayıt tek satır JSON'dur ve artan bir sıra numarası ("seq") alır; append() kaydı diske yazıp fsync eder,
+# yani döndüğünde kayıt kalıcıdır. Okuyanlar (aynı ya da başka süreçte) read_from() ile kaldıkları yerden
+# devam eder (tail).
+# Dosyanın ilk satırı rastgele bir kuşak (gen) kimliği taşır. compact() günlüğü atomik olarak yeniden yazar
+# (yeni kuşak); okuyanlar kimlik değişince dosyayı baştan okur ve daha önce gördükleri seq'leri atlar.
+import json
+import os
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from locks import atomic_write, path_lock
+
+# (kuşak, bayt konumu, son görülen seq)
+Cursor = Tuple[Optional[str], int, int]
+
+
+class Journal:
+    def __init__(self, path: str):
+        self.path = path
+
+    def lock(self):
+        # append/compact bu kilidi kendisi alır; "oku + uygula + sıkıştır" gibi birleşik işlemler için
+        # dışarıdan da alınabilir (_locked sürümleriyle birlikte)
+        return path_lock(self.path)
+
+    # ---------------- Yazma ----------------
+    def append(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        with self.lock():
+            return self._append_locked(records)
+
+    def _append_locked(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            head = b""
+            if os.fstat(fd).st_size == 0:
+                head = _header(1)
+                seq = 1
+            else:
+                seq = _last_seq(fd) + 1
+            out = []
+            for r in records:
+                r = dict(r, seq=seq)
+                seq += 1
+                out.append(r)
+            os.write(fd, head + _lines(out))
+            os.fsync(fd)
+            return out
+        finally:
+            os.close(fd)
+
+    def compact(self, keep: int, transform: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]] = None):
+        with self.lock():
+            self._compact_locked(keep, transform)
+
+    def _compact_locked(self, keep: int, transform=None):
+        # Günlük, son "keep" kaydı (transform verilirse onun döndürdükleri) kalacak şekilde yeniden yazılır.
+        # seq numaraları korunur; kayıt kalmazsa sıradaki seq başlıkta saklanır.
+        records = self.read_all()
+        next_seq = records[-1]["seq"] + 1 if records else self._base()
+        records = records[-keep:] if keep > 0 else []
+        if transform:
+            records = transform(records)
+        data = _header(records[0]["seq"] if records else next_seq) + _lines(records)
+        atomic_write(self.path, lambda f: f.write(data.decode("utf-8")))
+
+    # ---------------- Okuma ----------------
+    def read_from(self, cursor: Cursor = None) -> Tuple[List[Dict[str, Any]], Cursor]:
+        # (yeni kayıtlar, yeni cursor). Yarım kalmış son satır bir sonraki okumaya bırakılır.
+        # Dönen ilk kaydın seq'i cursor'daki son seq + 1 değilse arada sıkıştırılmış (kaybolmuş) kayıt var demektir.
+        last = cursor[2] if cursor else 0
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return [], (None, 0, last)
+        with f:
+            first = f.readline()
+            if not first.endswith(b"\n"):
+                return [], (None, 0, last)
+            gen = json.loads(first).get("gen")
+            pos = cursor[1] if cursor and cursor[0] == gen else len(first)
+            f.seek(pos)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        records = []
+        for line in data[:end].splitlines():
+            if line.strip():
+                try:
+                    r = json.loads(line)
+                except ValueError:
+                    continue  # bozuk satır (ör. disk dolu iken yarım yazılmış) atlanır
+                if r.get("seq", 0) > last:
+                    records.append(r)
+                    last = r["seq"]
+        return records, (gen, pos + end, last)
+
+    def read_all(self) -> List[Dict[str, Any]]:
+        return self.read_from(None)[0]
+
+    def _base(self) -> int:
+        try:
+            with open(self.path, "rb") as f:
+                return json.loads(f.readline()).get("base", 1)
+        except (OSError, ValueError):
+            return 1
+
+
+def _header(base: int) -> bytes:
+    return (json.dumps({"gen": uuid.uuid4().hex, "base": base}) + "\n").encode("utf-8")
+
+
+def _lines(records: List[Dict[str, Any]]) -> bytes:
+    return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+
+
+def _last_seq(fd: int) -> int:
+    # Son tam satırın seq'i (dosyanın sonundan geriye doğru okunur); sadece başlık varsa base - 1
+    size = os.fstat(fd).st_size
+    step = 4096
+    while True:
+        start = max(0, size - step)
+        data = os.pread(fd, size - start, start) if hasattr(os, "pread") else _read_at(fd, start, size - start)
+        lines = data.rstrip(b"\n").split(b"\n")
+        if start > 0 and len(lines) < 2:
+            step *= 2
+            continue
+        for line in reversed(lines if start == 0 else lines[1:]):
+            try:
+                r = json.loads(line)
+            except ValueError:
+                continue
+            if "seq" in r:
+                return r["seq"]
+            if "base" in r:
+                return r["base"] - 1
+        if start == 0:
+            return 0
+        step *= 2
+
+
+def _read_at(fd: int, offset: int, n: int) -> bytes:
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.read(fd, n)
@@ -0,0 +1,367 @@
+# locations.py
+# Ürün -> depo yeri eşlemesi (locations.db, "locations" tablosu).
+# Ürün adları normalize edilerek (normalize_name) aranır: boşluk, büyük/küçük harf ve I/İ/ı farkları eşleşmeyi bozmaz.
+# Tek kayıt güncellemesi idx_locations_norm üzerinden tek satıra dokunur; bellekteki eşleme sürüm (meta.version)
+# değişince yeniden okunur, bu süreçteki yazmalar ise eşlemeye doğrudan işlenir.
+# İlk açılışta tablo boşsa eski locations.csv / locations.json içeriği aktarılır.
+# Toplu aktarma (import_rows) ve dışa aktarma (export_rows) dosyayı satır satır işler; bellek kullanımı sabittir.
+import codecs
+import csv
+import io
+import itertools
+import json
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from typing import IO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from config import settings
+from store import Transaction
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS locations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    name_norm TEXT NOT NULL,
+    location TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_locations_norm ON locations(name_norm);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+"""
+
+REPORT_LIMIT = 200
+
+_TR_I = str.maketrans({"İ": "i", "I": "i", "ı": "i"})
+_DASHES = str.maketrans({"–": "-", "—": "-", "‐": "-", "‑": "-", "−": "-"})
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_name(name) -> str:
+    # "  Kalem  KUTUSU – Mavi" ve "kalem kutusu - mavi" aynı anahtar olur
+    s = unicodedata.normalize("NFKC", str(name or ""))
+    s = s.translate(_TR_I).translate(_DASHES).lower()
+    return _SPACES.sub(" ", s).strip()
+
+
+def fold_text(text) -> str:
+    # Arama için: normalize_name + aksanlar atılır ("Şişe", "SISE", "şişe" -> "sise"). Kayıt anahtarı DEĞİL.
+    s = unicodedata.normalize("NFKD", normalize_name(text))
+    return "".join(ch for ch in s if not unicodedata.combining(ch))
+
+
+class LocationStore:
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or settings.LOCATIONS_DB
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # normalize ad -> (ad, yer); _map_version sürümündeki tablo
+        self._map: Dict[str, Tuple[str, str]] = {}
+        self._map_version = None
+        self._con().executescript(_SCHEMA)
+
+    def _con(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def _tx(self):
+        return Transaction(self._con())
+
+    def version(self):
+        return self._con().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    # ---------------- Okuma ----------------
+    def _fresh_map(self) -> Dict[str, Tuple[str, str]]:
+        version = self.version()
+        if version == self._map_version:
+            return self._map
+        with self._lock:
+            if version != self._map_version:
+                m: Dict[str, Tuple[str, str]] = {}
+                con = self._con()
+                con.execute("BEGIN")
+                try:
+                    version = con.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+                    for name, norm, location in con.execute(
+                            "SELECT name, name_norm, location FROM locations ORDER BY id"):
+                        m[norm] = (name, location)
+                finally:
+                    con.execute("COMMIT")
+                self._map, self._map_version = m, version
+            return self._map
+
+    def get(self, name) -> str:
+        return self.lookup()(name)
+
+    def lookup(self) -> Callable[[str], str]:
+        # ad -> yer fonksiyonu; sürüm bir kez kontrol edilir (bir sayfadaki tüm ürünler için)
+        m = self._fresh_map()
+
+        def yer(name) -> str:
+            hit = m.get(normalize_name(name))
+            return hit[1] if hit else ""
+        return yer
+
+    def items(self, q: str = "") -> List[Tuple[str, str]]:
+        # (ad, yer) çiftleri ada göre sıralı; q verilirse adında q geçenler (Türkçe harf/aksan farkı gözetmeden)
+        m = self._fresh_map()
+        with self._lock:
+            rows = list(m.values())
+        if q:
+            qn = fold_text(q)
+            rows = [r for r in rows if qn in fold_text(r[0])]
+        rows.sort(key=lambda r: normalize_name(r[0]))
+        return rows
+
+    def __len__(self) -> int:
+        return len(self._fresh_map())
+
+    # ---------------- Yazma ----------------
+    def set(self, name, location) -> str:
+        # "inserted" | "updated" | "unchanged" | "deleted" (boş yer kaydı siler)
+        counts = self.upsert_many([(name, location)])
+        return next(k for k, v in counts.items() if v)
+
+    def upsert_many(self, rows: Iterable[Tuple[str, str]], delete_empty: bool = True,
+                    changes: Optional[list] = None) -> Dict[str, int]:
+        # Hepsi tek işlemde; her satır için normalize ada göre tek indeks araması.
+        # delete_empty=False: yeri boş satırlar silmek yerine atlanır (toplu aktarma).
+        # changes verilirse ilk REPORT_LIMIT değişiklik (işlem, ad, eski yer, yeni yer) olarak eklenir.
+        counts = _empty_counts()
+        applied: List[Tuple[str, Optional[Tuple[str, str]]]] = []
+        with self._tx() as con:
+            start_version = con.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+            for name, location in rows:
+                name, norm, location = _clean(name, location)
+                existing = None
+                if norm:
+                    existing = con.execute("SELECT name, location FROM locations WHERE name_norm = ? "
+                                           "ORDER BY id DESC LIMIT 1", (norm,)).fetchone()
+                action = _decide(norm, existing, location, delete_empty)
+                counts[action] += 1
+                if action == "deleted":
+                    con.execute("DELETE FROM locations WHERE name_norm = ?", (norm,))
+                    applied.append((norm, None))
+                elif action == "inserted":
+                    con.execute("INSERT INTO locations (name, name_norm, location) VALUES (?, ?, ?)",
+                                (name, norm, location))
+                    applied.append((norm, (name, location)))
+                elif action == "updated":
+                    con.execute("UPDATE locations SET location = ? WHERE name_norm = ?", (location, norm))
+                    applied.append((norm, (existing[0], location)))
+                else:
+                    continue
+                if changes is not None and len(changes) < REPORT_LIMIT:
+                    changes.append((action, existing[0] if existing else name, existing[1] if existing else "",
+                                    location))
+        self._patch_map(start_version, applied)
+        return counts
+
+    def diff(self, rows: Iterable[Tuple[str, str]], delete_empty: bool = True,
+             changes: Optional[list] = None) -> Dict[str, int]:
+        # upsert_many'nin yazmadan sonucu (ön izleme); dosyada aynı ürün birden çok kez geçerse sonuncusu geçerli
+        counts = _empty_counts()
+        m = self._fresh_map()
+        pending: Dict[str, Optional[Tuple[str, str]]] = {}
+        for name, location in rows:
+            name, norm, location = _clean(name, location)
+            existing = pending[norm] if norm in pending else m.get(norm)
+            action = _decide(norm, existing, location, delete_empty)
+            counts[action] += 1
+            if action == "deleted":
+                pending[norm] = None
+            elif action in ("inserted", "updated"):
+                pending[norm] = (existing[0] if existing else name, location)
+            else:
+                continue
+            if changes is not None and len(changes) < REPORT_LIMIT:
+                changes.append((action, existing[0] if existing else name, existing[1] if existing else "",
+                                location))
+        return counts
+
+    def _patch_map(self, start_version, applied):
+        # Eşleme yazmadan hemen önceki sürümdeyse değişiklikler doğrudan işlenir (tüm tabloyu yeniden okumadan)
+        if not applied:
+            return
+        with self._lock:
+            if self._map_version != start_version:
+                return
+            m = self._map
+            for norm, value in applied:
+                if value is None:
+                    m.pop(norm, None)
+                else:
+                    m[norm] = value
+            self._map_version = start_version + 1
+
+    # ---------------- Eski dosyalardan aktarma ----------------
+    def import_files(self, csv_path: str = None, json_path: str = None) -> Dict[str, int]:
+        # locations.csv ("ad,yer" satırları) ve locations.json ({"ad": "yer"}) içeriğini ekler/günceller
+        counts = _empty_counts()
+        if csv_path and os.path.exists(csv_path):
+            with open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
+                _add_counts(counts, self.import_rows(read_csv_rows(f)))
+        if json_path and os.path.exists(json_path):
+            with open(json_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                _add_counts(counts, self.import_rows(data.items()))
+        return counts
+
+    def import_rows(self, rows: Iterable[Tuple[str, str]], dry_run: bool = False, batch: int = None,
+                    changes: Optional[list] = None) -> Dict[str, int]:
+        # Toplu aktarma: satırlar batch'lik işlemlerle yazılır (bellek ve kilit süresi sabit kalır).
+        # Yeri boş satırlar atlanır; dry_run=True ise hiçbir şey yazılmaz, sadece fark hesaplanır.
+        batch = batch or settings.LOCATIONS_IMPORT_BATCH
+        if dry_run:
+            return self.diff(rows, delete_empty=False, changes=changes)
+        counts = _empty_counts()
+        chunk: List[Tuple[str, str]] = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= batch:
+                _add_counts(counts, self.upsert_many(chunk, delete_empty=False, changes=changes))
+                chunk = []
+        if chunk:
+            _add_counts(counts, self.upsert_many(chunk, delete_empty=False, changes=changes))
+        return counts
+
+    def export_rows(self, batch: int = 1000) -> Iterator[Tuple[str, str]]:
+        # (ad, yer) çiftleri ada göre sıralı, batch'ler halinde okunur.
+        # Kendi bağlantısını kullanır: StreamingResponse her parçayı farklı bir thread'de isteyebilir.
+        con = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        try:
+            con.execute("BEGIN")
+            cur = con.execute("SELECT name, location FROM locations ORDER BY name_norm, id")
+            while True:
+                rows = cur.fetchmany(batch)
+                if not rows:
+                    break
+                yield from rows
+            con.execute("COMMIT")
+        finally:
+            con.close()
+
+    def import_legacy_once(self):
+        # Tablo boşsa ve daha önce aktarılmadıysa eski dosyalar bir kez aktarılır
+        con = self._con()
+        if con.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone():
+            return
+        if not con.execute("SELECT 1 FROM locations LIMIT 1").fetchone():
+            self.import_files(settings.LOCATIONS_CSV, settings.LOCATIONS_JSON)
+        con.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('legacy_imported', 1)")
+
+
+def _clean(name, location) -> Tuple[str, str, str]:
+    name = str(name or "").strip()
+    return name, normalize_name(name), str(location or "").strip()
+
+
+def _decide(norm: str, existing, location: str, delete_empty: bool) -> str:
+    if not norm:
+        return "skipped"
+    if not location:
+        if not delete_empty:
+            return "skipped"
+        return "deleted" if existing else "unchanged"
+    if existing is None:
+        return "inserted"
+    return "unchanged" if existing[1] == location else "updated"
+
+
+def _empty_counts() -> Dict[str, int]:
+    return {"inserted": 0, "updated": 0, "unchanged": 0, "deleted": 0, "skipped": 0}
+
+
+def _add_counts(total: Dict[str, int], part: Dict[str, int]):
+    for k, v in part.items():
+        total[k] += v
+
+
+# ---------------- CSV ----------------
+HEADER_NAMES = {normalize_name(h) for h in ("name", "ad", "ürün", "urun", "ürün adı", "urun adi", "product")}
+
+
+def read_csv_rows(f: IO[str]) -> Iterator[Tuple[str, str]]:
+    # "ad,yer" satırları (tırnaklı alanlar, alan içinde virgül/satır sonu desteklenir).
+    # Excel'in Türkçe ayarlarla kaydettiği ";" ayraçlı dosyalar ve başlık satırı tanınır; dosya satır satır okunur.
+    first = f.readline()
+    if not first:
+        return
+    delimiter = ";" if first.count(";") > first.count(",") else ","
+    reader = csv.reader(itertools.chain([first], f), delimiter=delimiter)
+    for i, row in enumerate(reader):
+        if len(row) < 2:
+            continue
+        if i == 0 and normalize_name(row[0]) in HEADER_NAMES:
+            continue
+        yield row[0], row[1]
+
+
+def open_csv_upload(raw: IO[bytes]) -> IO[str]:
+    # Yüklenen dosyanın kodlaması ilk 64 KB'tan tahmin edilir: UTF-8 (BOM'lu/BOM'suz) değilse Excel'in
+    # Türkçe Windows'ta kullandığı cp1254 varsayılır.
+    head = raw.read(65536)
+    raw.seek(0)
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        encoding = "utf-8-sig"
+    except UnicodeDecodeError:
+        encoding = "cp1254"
+    # TextIOWrapper yerine codecs okuyucusu: SpooledTemporaryFile (UploadFile) eski Python'larda onu desteklemiyor
+    return codecs.getreader(encoding)(raw, errors="replace")
+
+
+def write_csv_rows(rows: Iterable[Tuple[str, str]], batch: int = 1000) -> Iterator[str]:
+    # CSV metnini parça parça üretir (StreamingResponse için); BOM, Excel'in Türkçe karakterleri doğru açması için
+    yield "\ufeff"
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    n = 0
+    for row in rows:
+        w.writerow(row)
+        n += 1
+        if n % batch == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+_instance: Optional[LocationStore] = None
+_instance_lock = threading.Lock()
+
+
+def get_locations_store() -> LocationStore:
+    global _instance
+    with _instance_lock:
+        if _instance is None:
+            store = LocationStore()
+            store.import_legacy_once()
+            _instance = store
+        return _instance
+
+
+if __name__ == "__main__":
+    # Kullanım: python locations.py import [dosya.csv | dosya.json ...]
+    import sys
+    if len(sys.argv) >= 2 and sys.argv[1] == "import":
+        paths = sys.argv[2:] or [settings.LOCATIONS_CSV, settings.LOCATIONS_JSON]
+        store = LocationStore()
+        for p in paths:
+            counts = store.import_files(p if p.endswith(".csv") else None, p if p.endswith(".json") else None)
+            print(f"{p}: {counts}")
+        print(f"{len(store)} ürünün depo yeri {store.db_path} dosyasında.")
+    else:
+        print("Kullanım: python locations.py import [dosya.csv | dosya.json ...]")
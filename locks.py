@@ -0,0 +1,103 @@
+# locks.py
+# Süreçler (gunicorn worker'ları, masaüstü uygulaması) arası dosya kilidi ve atomik dosya yazma.
+# POSIX'te fcntl.flock, Windows'ta msvcrt.locking kullanılır; süreç ölürse kilit işletim sistemince bırakılır.
+import os
+import tempfile
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    @property
+    def locked(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self, blocking: bool = True, timeout: float = None) -> bool:
+        # blocking=False: kilit başkasındaysa hemen False döner
+        if self._fd is not None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                self._fd = fd
+                return True
+            except OSError:
+                if not blocking or (deadline is not None and time.monotonic() >= deadline):
+                    os.close(fd)
+                    return False
+                time.sleep(0.05)
+
+    def release(self):
+        fd, self._fd = self._fd, None
+        if fd is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def path_lock(path: str) -> FileLock:
+    # Bir veri dosyasının oku-değiştir-yaz kilidi ("<dosya>.lock").
+    # Kilit yeniden girilebilir değildir: kilit tutulurken aynı dosya için tekrar alınmamalı.
+    return FileLock(path + ".lock")
+
+
+def atomic_write(path: str, write, encoding: str = "utf-8", newline: str = None, binary: bool = False):
+    # write(f) aynı klasörde geçici bir dosyaya yazar, sonra os.replace ile yerine konur:
+    # okuyan ya eski ya yeni dosyayı görür, yarım yazılmış dosyayı asla. binary=True: f bayt kabul eder
+    d = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=d)
+    try:
+        if binary:
+            f = os.fdopen(fd, "wb")
+        else:
+            f = os.fdopen(fd, "w", encoding=encoding, newline=newline)
+        with f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.chmod(tmp, os.stat(path).st_mode & 0o777)
+        except OSError:
+            os.chmod(tmp, 0o644)
+        for deneme in range(10):
+            try:
+                os.replace(tmp, path)
+                break
+            except PermissionError:
+                # Windows: hedef o an başka bir süreçte açıksa kısa süre sonra tekrar dene
+                if deneme == 9:
+                    raise
+                time.sleep(0.05)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
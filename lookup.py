@@ -0,0 +1,95 @@
+# lookup.py
+# El terminali (barkod okuyucu) için ürün arama indeksi.
+# Barkod ve stok koduna göre tam eşleşme sözlükle (tek arama), ürün adına göre arama ise sıralı
+# kelime listesinde bisect ile önek aralığı bulunarak yapılır (önek ağacının düz dizi hali).
+# Adlar fold_text ile katlanır: "sise" araması "Şişe"yi bulur.
+# İndeks bir sipariş görüntüsünden (snapshot.OrderSnapshot.products) kurulur; görüntüyle birlikte yenilenir.
+import bisect
+from typing import Any, Dict, List, Tuple
+
+from locations import fold_text
+from picklist import group_key, is_open
+
+
+def code_key(code) -> str:
+    # Okuyucular kodun sonuna boşluk/satır sonu ekleyebilir; stok kodlarında büyük/küçük harf fark etmez.
+    # Sadece rakamdan oluşan kodlarda baştaki sıfırlar atılır (UPC-A 12 hane / EAN-13 "0" ile başlayan aynı ürün).
+    key = "".join(str(code or "").split()).casefold()
+    if key.isdigit():
+        key = key.lstrip("0") or "0"
+    return key
+
+
+class ProductIndex:
+    def __init__(self, orders: List[Dict[str, Any]]):
+        # (ad, barkod) -> ürün; picklist'teki gruplamayla aynı anahtar
+        self.products: Dict[tuple, Dict[str, Any]] = {}
+        self.lines: Dict[tuple, List[tuple]] = {}  # anahtar -> (sipariş, satır) çiftleri
+        self._by_barcode: Dict[str, List[tuple]] = {}
+        self._by_stock_code: Dict[str, List[tuple]] = {}
+        for o in orders:
+            for u in o.get("order_product", []) or []:
+                key = group_key(u)
+                if key not in self.products:
+                    self.products[key] = {
+                        "name": u.get("name", "") or "",
+                        "barcode": str(u.get("barcode", "") or ""),
+                        "stock_code": str(u.get("store_stock_code", "") or ""),
+                        "picture": u.get("picture", "") or "",
+                    }
+                    self.lines[key] = []
+                self.lines[key].append((o, u))
+        words = []
+        for key, p in self.products.items():
+            if p["barcode"]:
+                self._by_barcode.setdefault(code_key(p["barcode"]), []).append(key)
+            if p["stock_code"]:
+                self._by_stock_code.setdefault(code_key(p["stock_code"]), []).append(key)
+            norm = fold_text(p["name"])
+            # Her kelime ayrı girilir: "şişe" araması "Cam Şişe 1L" ürününü de bulur
+            for word in set(norm.split()):
+                words.append((word, norm, key))
+        words.sort()
+        self._words = words
+        self._word_keys = [w for w, _norm, _key in words]
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def find_code(self, code) -> Tuple[str, List[tuple]]:
+        # ("barcode" | "stock_code" | "", anahtarlar); önce barkod, yoksa stok kodu
+        key = code_key(code)
+        if not key:
+            return "", []
+        keys = self._by_barcode.get(key)
+        if keys:
+            return "barcode", keys
+        keys = self._by_stock_code.get(key)
+        if keys:
+            return "stock_code", keys
+        return "", []
+
+    def open_lines(self, key) -> List[tuple]:
+        # Ürünün kapanmamış (toplanacaklar listesine giren) siparişlerdeki satırları
+        return [(o, u) for o, u in self.lines.get(key, []) if is_open(o)]
+
+    def _prefixed(self, prefix: str) -> Dict[tuple, str]:
+        # Kelimelerinden biri prefix ile başlayan ürünler (anahtar -> normalize ad)
+        lo = bisect.bisect_left(self._word_keys, prefix)
+        hi = bisect.bisect_left(self._word_keys, prefix + "\uffff")
+        return {key: norm for _w, norm, key in self._words[lo:hi]}
+
+    def search(self, q, limit: int = 20) -> List[tuple]:
+        # Sorgudaki her kelime, adın bir kelimesinin öneki olmalı. Adı sorguyla başlayanlar önce, sonra ada göre.
+        tokens = fold_text(q).split()
+        if not tokens:
+            return []
+        found = None
+        for token in sorted(set(tokens), key=len, reverse=True):
+            matches = self._prefixed(token)
+            found = matches if found is None else {k: n for k, n in found.items() if k in matches}
+            if not found:
+                return []
+        phrase = " ".join(tokens)
+        ranked = sorted(found.items(), key=lambda kv: (not kv[1].startswith(phrase), kv[1], kv[0]))
+        return [key for key, _norm in ranked[:limit]]
@@ -36,8 +36,12 @@ if __name__ == "__main__":
 
 import tkinter as tk
 from tkinter import ttk, messagebox
-from api import read_orders, save_orders_to_json, entegrabilisim_get_all_orders, merge_and_save_orders
-from utils import unique_list, calc_days_ago, get_hour, delete_order, add_to_done_orders
+from api import read_orders, set_collected, cancel_order, complete_order
+from events import get_events
+from sync import sync_orders
+from utils import unique_list, calc_days_ago, get_hour, order_dt, parse_filter_date
+from snapshot import get_orders_snapshot
+from locations import fold_text
 from invoice import print_invoice_direct
 from datetime import datetime
 
@@ -85,16 +89,12 @@ def filtre_ve_ara():
 tk.Button(filter_inner, text="Ara", command=filtre_ve_ara, font=("Arial", 11, "bold"), background="#e3f0ff", foreground="#19456b", bd=0, padx=8, pady=2, activebackground="#b8e2f2", width=7).pack(side="left", padx=(2,2))
 
 def depo_urun_set_collected(barcode, value):
-    orders = read_orders()
-    for order in orders:
-        for urun in order.get("order_product", []):
-            if urun.get("barcode", "") == barcode:
-                urun["collected"] = value
-    save_orders_to_json(orders)
+    set_collected(barcode, value)
 
 def ac_depo_penceresi():
-    from depo import DepoPencere, get_depo_urunler
-    DepoPencere(root, depo_urun_set_collected, get_depo_urunler)
+    from depo import DepoPencere
+    from snapshot import query_picklist
+    DepoPencere(root, depo_urun_set_collected, query_picklist)
 
 def token_guncelle_popup():
     win = tk.Toplevel()
@@ -127,15 +127,22 @@ canvas_frame = tk.Frame(root, background="#e7eaff")
 canvas_frame.pack(fill="both", expand=True, padx=18, pady=8)
 canvas = tk.Canvas(canvas_frame, background="#e7eaff", highlightthickness=0)
 scrollbar = tk.Scrollbar(canvas_frame, orient="vertical", command=canvas.yview)
-canvas.configure(yscrollcommand=scrollbar.set)
 scrollbar.pack(side="right", fill="y")
 canvas.pack(side="left", fill="both", expand=True)
-siparisler_frame = tk.Frame(canvas, background="#e7eaff")
-canvas.create_window((0, 0), window=siparisler_frame, anchor='nw')
 
-def on_configure(event):
-    canvas.configure(scrollregion=canvas.bbox('all'))
-siparisler_frame.bind("<Configure>", on_configure)
+# Sanal kart listesi: sadece görünen satırlar için kart çizilir, kaydırınca aynı kartlar
+# yeni satırların verisiyle yeniden kullanılır (binlerce siparişte de birkaç düzine widget)
+KART_YUKSEKLIK = 105
+SATIR_YUKSEKLIK = KART_YUKSEKLIK + 12
+liste_orders = []
+kart_havuzu = []
+
+def _on_yscroll(first, last):
+    scrollbar.set(first, last)
+    gorunen_kartlari_ciz()
+canvas.configure(yscrollcommand=_on_yscroll)
+canvas.bind("<Configure>", lambda e: gorunen_kartlari_ciz())
+
 def _on_mousewheel(event):
     canvas.yview_scroll(int(-1*(event.delta/120)), "units")
 canvas.bind("<Enter>", lambda e: canvas.bind_all("<MouseWheel>", _on_mousewheel))
@@ -151,13 +158,11 @@ def show_order_popup(order):
     popup.title("Sipariş Detayı")
     popup.geometry("660x420")
     popup.config(bg="#f5f6fa")
-    tarih = order.get("datetime", "")
-    try:
-        dt = datetime.strptime(tarih, "%Y-%m-%d %H:%M:%S")
-        now = datetime.now()
-        gecen_saat = (now - dt).total_seconds() / 3600
+    dt = order_dt(order)
+    if dt:
+        gecen_saat = (datetime.now() - dt).total_seconds() / 3600
         saat = dt.hour
-    except:
+    else:
         gecen_saat = 0
         saat = 0
     if gecen_saat >= 24:
@@ -196,24 +201,14 @@ def show_order_popup(order):
         tk.Label(urunler_box, text=urun.get("price", ""), background="#ebf2fa").grid(row=i+2, column=3)
         var = tk.BooleanVar(value=urun.get("collected", False))
         def cb_update(barcode=urun.get("barcode"), v=var):
-            orders = read_orders()
-            for order_x in orders:
-                for urun_x in order_x.get("order_product", []):
-                    if urun_x.get("barcode", "") == barcode:
-                        urun_x["collected"] = v.get()
-            save_orders_to_json(orders)
+            set_collected(barcode, v.get(), order.get("no"))
         cb = tk.Checkbutton(urunler_box, variable=var, background="#ebf2fa", command=cb_update)
         cb.grid(row=i+2, column=4)
         urun_vars.append(var)
     btn_frame = tk.Frame(popup, background="#f5f6fa")
     btn_frame.pack(pady=12)
     def iptal_et(order):
-        orders = read_orders()
-        for o in orders:
-            if str(o.get("no")) == str(order.get("no")):
-                o["store_order_status"] = "-1"
-                o["store_order_status_name"] = "İptal Edildi"
-        save_orders_to_json(orders)
+        cancel_order(order.get("no"))
         refresh_cards()
         popup.destroy()
     def try_print_invoice():
@@ -222,8 +217,7 @@ def show_order_popup(order):
                 # YAZICIYA OTOMATİK GÖNDER (EKRAN GELMEDEN)
                 print_invoice_direct(order)
                 # Burada istersek siparişi silip done_orders’a da ekleyebiliriz
-                delete_order(order.get("no"))
-                add_to_done_orders(order.get("no"))
+                complete_order(order.get("no"))
             except Exception as e:
                 messagebox.showerror("Hata", f"Yazdırma sırasında hata oluştu:\n{e}")
             finally:
@@ -235,14 +229,15 @@ def show_order_popup(order):
     tk.Button(btn_frame, text="İptal Et", font=("Arial",10), background="#fff", foreground="#c62828", command=lambda: iptal_et(order)).pack(side="left", padx=8)
 
 def refresh_cards():
-    for widget in siparisler_frame.winfo_children():
-        widget.destroy()
-
-    orders = read_orders()
+    global liste_orders
+    # Tarih aralığı sıralı indeksten dilim olarak gelir; diğer filtreler bu dilime uygulanır
+    t1 = tarih1_var.get().strip()
+    t2 = tarih2_var.get().strip()
+    orders = get_orders_snapshot().between(parse_filter_date(t1), parse_filter_date(t2, end_of_day=True))
     f_durum = durum_var.get()
 
     def is_iptal(o):
-        status_name = (o.get("store_order_status_name") or "").lower()
+        status_name = fold_text(o.get("store_order_status_name"))
         status = str(o.get("store_order_status", "")).strip()
         return ("iptal" in status_name) or (status == "-1")
 
@@ -260,7 +255,7 @@ def refresh_cards():
         keywords = durum_map.get(f_durum, [])
         orders = [
             o for o in orders
-            if any(k.lower() in (o.get("store_order_status_name") or "").lower() for k in keywords)
+            if any(fold_text(k) in fold_text(o.get("store_order_status_name")) for k in keywords)
             and not is_iptal(o)
         ]
 
@@ -268,14 +263,6 @@ def refresh_cards():
         orders = [o for o in orders if o.get("entegration", "") == platform_var.get()]
     if kargo_var.get() != "TÜMÜ":
         orders = [o for o in orders if o.get("cargo_company", "") == kargo_var.get()]
-    t1 = tarih1_var.get().strip()
-    t2 = tarih2_var.get().strip()
-    d1 = datetime.strptime(t1, "%d.%m.%Y") if t1 else None
-    d2 = datetime.strptime(t2, "%d.%m.%Y") if t2 else None
-    if d1:
-        orders = [o for o in orders if datetime.strptime(o.get("datetime", ""), "%Y-%m-%d %H:%M:%S") >= d1]
-    if d2:
-        orders = [o for o in orders if datetime.strptime(o.get("datetime", ""), "%Y-%m-%d %H:%M:%S") <= d2]
 
     # Sadece ürünlerinin herhangi biri toplanmış olan siparişler
     orders = [
@@ -295,18 +282,88 @@ def refresh_cards():
 
     toplam_siparis_var.set(f"Toplam Sipariş: {len(orders)}")
 
-    for idx, order in enumerate(orders):
-        card = tk.Frame(siparisler_frame, background="#273144", height=105, width=1230, bd=0, relief="ridge")
-        card.pack(fill="x", pady=(0,12), padx=5)
+    liste_orders = orders
+    for kart in kart_havuzu:
+        kart.order = None  # aynı sipariş nesnesi değişmiş olabilir (toplandı işareti), yeniden doldurulsun
+    canvas.configure(scrollregion=(0, 0, 1240, len(orders) * SATIR_YUKSEKLIK))
+    gorunen_kartlari_ciz()
+
+def gorunen_kartlari_ciz():
+    # Görünen aralıktaki satırlar (+1 tampon) için havuzdan kart alınır, geri kalanlar gizlenir
+    if not liste_orders:
+        for kart in kart_havuzu:
+            kart.gizle()
+        return
+    ust = int(canvas.canvasy(0))
+    ilk = max(0, ust // SATIR_YUKSEKLIK - 1)
+    son = min(len(liste_orders), (ust + canvas.winfo_height()) // SATIR_YUKSEKLIK + 2)
+    while len(kart_havuzu) < son - ilk:
+        kart_havuzu.append(SiparisKarti())
+    for n, kart in enumerate(kart_havuzu):
+        idx = ilk + n
+        if idx < son:
+            kart.goster(liste_orders[idx], idx * SATIR_YUKSEKLIK)
+        else:
+            kart.gizle()
+
+class SiparisKarti:
+    def __init__(self):
+        self.order = None
+        card = tk.Frame(canvas, background="#273144", height=KART_YUKSEKLIK, width=1230, bd=0, relief="ridge")
         card.grid_propagate(False)
+        self.frame = card
+        self.window = canvas.create_window(5, 0, window=card, anchor="nw", width=1230, height=KART_YUKSEKLIK)
+        gradient = tk.Canvas(card, width=100, height=105, background="#ffb0b0", highlightthickness=0)
+        gradient.place(x=0, y=0)
+        self.oval = gradient.create_oval(-60, 20, 90, 130)
+        gradient.create_rectangle(45, 0, 145, 120, fill="#273144", outline="#273144")
+        gradient.create_text(34, 60, text="❗", font=("Arial", 36, "bold"), fill="#fff")
+        self.gradient = gradient
+
+        def etiket(x, y, **kw):
+            lbl = tk.Label(card, **kw)
+            lbl.place(x=x, y=y)
+            return lbl
+        self.musteri = etiket(105, 10, font=("Arial", 15, "bold"), background="#273144", foreground="#fff")
+        self.order_id = etiket(600, 13, font=("Arial", 11, "bold"), background="#273144", foreground="#f7e7b8")
+        self.toplam = etiket(900, 13, font=("Arial", 11, "bold"), background="#273144", foreground="#f7e7b8")
+        self.tarih = etiket(105, 35, font=("Arial", 11), background="#273144", foreground="#fff")
+        orta_y = 55
+        etiket(230, orta_y, text=f"Depodan Çıkan Ürün", font=("Arial",10), background="#273144", foreground="#e6e6e6")
+        self.toplanan = etiket(390, orta_y, font=("Arial",13,"bold"), background="#273144", foreground="#fff")
+        etiket(460, orta_y, text=f"Eşleşen Ürün", font=("Arial",10), background="#273144", foreground="#e6e6e6")
+        self.eslesen = etiket(610, orta_y, font=("Arial",13,"bold"), background="#273144", foreground="#4ad29a")
+        etiket(670, orta_y, text=f"Toplam Ürün", font=("Arial",10), background="#273144", foreground="#e6e6e6")
+        self.toplam_urun = etiket(810, orta_y, font=("Arial",13,"bold"), background="#273144", foreground="#fff")
+        self.platform = tk.Label(card, font=("Arial",13,"bold"), background="#fff", foreground="#c62828", bd=0, relief="flat")
+        self.platform.place(x=960, y=63, width=144, height=36)
+        self.gun_once = etiket(1120, 77, font=("Arial",10,"bold"), background="#273144", foreground="#ff5050")
+        self.kargo = etiket(960, 40, font=("Arial",10,"bold"), background="#273144", foreground="#f7e7b8")
+        card.bind("<Button-1>", self._tikla)
+        for w in card.winfo_children():
+            w.bind("<Button-1>", self._tikla)
+
+    def _tikla(self, event):
+        if self.order is not None:
+            show_order_popup(self.order)
+
+    def gizle(self):
+        self.order = None
+        canvas.itemconfigure(self.window, state="hidden")
+
+    def goster(self, order, y):
+        canvas.coords(self.window, 5, y)
+        canvas.itemconfigure(self.window, state="normal")
+        if order is self.order:
+            return
+        self.order = order
         tarih = order.get("datetime", "")
-        try:
-            dt = datetime.strptime(tarih, "%Y-%m-%d %H:%M:%S")
+        dt = order_dt(order)
+        if dt:
             saat = dt.hour
-            now = datetime.now()
-            gecen_saat = (now - dt).total_seconds() / 3600
-            gun_once = calc_days_ago(tarih)
-        except:
+            gecen_saat = (datetime.now() - dt).total_seconds() / 3600
+            gun_once = calc_days_ago(dt)
+        else:
             gecen_saat = 0
             saat = 0
             gun_once = ""
@@ -318,49 +375,28 @@ def refresh_cards():
             renk = "#f87171"
         else:
             renk = "#5bc980"
-
-        gradient = tk.Canvas(card, width=100, height=105, background="#ffb0b0", highlightthickness=0)
-        gradient.place(x=0, y=0)
-        gradient.create_oval(-60, 20, 90, 130, fill=renk, outline=renk)
-        gradient.create_rectangle(45, 0, 145, 120, fill="#273144", outline="#273144")
-        gradient.create_text(34, 60, text="❗", font=("Arial", 36, "bold"), fill="#fff")
-        musteri = f"{order.get('firstname','')} {order.get('lastname','')}".strip()
-        order_id = order.get("no", "")
-        toplam = order.get("grand_total", "")
+        self.gradient.itemconfigure(self.oval, fill=renk, outline=renk)
         urunler = order.get("order_product", [])
-        toplam_urun = len(urunler)
         toplanan_urun = sum(1 for u in urunler if u.get("collected", False))
-        eslesen_urun = sum(1 for u in urunler if u.get("collected", False))
-        tk.Label(card, text=musteri, font=("Arial", 15, "bold"), background="#273144", foreground="#fff").place(x=105, y=10)
-        tk.Label(card, text=f"Order Id: {order_id}", font=("Arial", 11, "bold"), background="#273144", foreground="#f7e7b8").place(x=600, y=13)
-        tk.Label(card, text=f"Toplam: {toplam} TL", font=("Arial", 11, "bold"), background="#273144", foreground="#f7e7b8").place(x=900, y=13)
-        tk.Label(card, text=f"{tarih[:16]}", font=("Arial", 11), background="#273144", foreground="#fff").place(x=105, y=35)
-        orta_y = 55
-        tk.Label(card, text=f"Depodan Çıkan Ürün", font=("Arial",10), background="#273144", foreground="#e6e6e6").place(x=230, y=orta_y)
-        tk.Label(card, text=str(toplanan_urun), font=("Arial",13,"bold"), background="#273144", foreground="#fff").place(x=390, y=orta_y)
-        tk.Label(card, text=f"Eşleşen Ürün", font=("Arial",10), background="#273144", foreground="#e6e6e6").place(x=460, y=orta_y)
-        tk.Label(card, text=str(eslesen_urun), font=("Arial",13,"bold"), background="#273144", foreground="#4ad29a").place(x=610, y=orta_y)
-        tk.Label(card, text=f"Toplam Ürün", font=("Arial",10), background="#273144", foreground="#e6e6e6").place(x=670, y=orta_y)
-        tk.Label(card, text=str(toplam_urun), font=("Arial",13,"bold"), background="#273144", foreground="#fff").place(x=810, y=orta_y)
-        platform = order.get("entegration","")
-        kargo = order.get("cargo_company","")
-        tk.Label(card, text=platform, font=("Arial",13,"bold"), background="#fff", foreground="#c62828", bd=0, relief="flat").place(x=960, y=63, width=144, height=36)
-        tk.Label(card, text=f"{gun_once}", font=("Arial",10,"bold"), background="#273144", foreground="#ff5050").place(x=1120, y=77)
-        tk.Label(card, text=kargo, font=("Arial",10,"bold"), background="#273144", foreground="#f7e7b8").place(x=960, y=40)
-        card.bind("<Button-1>", lambda e, o=order: show_order_popup(o))
-        for w in card.winfo_children():
-            w.bind("<Button-1>", lambda e, o=order: show_order_popup(o))
-        gradient.bind("<Button-1>", lambda e, o=order: show_order_popup(o))
+        self.musteri.configure(text=f"{order.get('firstname','')} {order.get('lastname','')}".strip())
+        self.order_id.configure(text=f"Order Id: {order.get('no', '')}")
+        self.toplam.configure(text=f"Toplam: {order.get('grand_total', '')} TL")
+        self.tarih.configure(text=f"{tarih[:16]}")
+        self.toplanan.configure(text=str(toplanan_urun))
+        self.eslesen.configure(text=str(toplanan_urun))
+        self.toplam_urun.configure(text=str(len(urunler)))
+        self.platform.configure(text=order.get("entegration",""))
+        self.gun_once.configure(text=f"{gun_once}")
+        self.kargo.configure(text=order.get("cargo_company",""))
 
 def yenile_orders_api():
     def run():
-        new_orders = entegrabilisim_get_all_orders()
-        if new_orders:
-            merge_and_save_orders(new_orders)
-            refresh_cards()
-            messagebox.showinfo("Başarılı", "Son 24 saatlik siparişler güncellendi!")
+        sonuc = sync_orders()
+        if sonuc["failed_pages"]:
+            messagebox.showwarning("Uyarı", f"API'dan {sonuc['failed_pages']} sayfa çekilemedi, sonraki güncellemede tekrar denenecek.")
         else:
-            messagebox.showwarning("Uyarı", "API'dan yeni sipariş çekilemedi!")
+            refresh_cards()
+            messagebox.showinfo("Başarılı", f"Siparişler güncellendi! ({sonuc['inserted']} yeni, {sonuc['updated']} güncellenen, {sonuc['skipped']} değişmeyen; {sonuc['start']} - {sonuc['end']})")
     import threading
     threading.Thread(target=run).start()
 
@@ -368,6 +404,21 @@ def auto_update_orders():
     yenile_orders_api()
     root.after(30*60*1000, auto_update_orders)
 
+# Olay günlüğünü izle: web'den ya da başka bir uygulamadan gelen değişikliklerde kartları yenile
+olay_cursor = get_events().cursor()
+
+def olaylari_izle():
+    global olay_cursor
+    try:
+        olaylar, olay_cursor = get_events().tail(olay_cursor)
+        if olaylar:
+            refresh_cards()
+    except Exception as e:
+        print(f"Olay günlüğü okunamadı: {e}")
+    root.after(3000, olaylari_izle)
+
+get_events().start()
 refresh_cards()
 root.after(10*1000, auto_update_orders)
+root.after(3000, olaylari_izle)
 root.mainloop()
@@ -0,0 +1,254 @@
+# picklist.py
+# "Depodan Toplanacaklar" listesinin hazır (materialized) görünümü.
+# Ürünler (ad, barkod) çiftine göre gruplanır; adet toplamları, platform dağılımı,
+# en eski sipariş tarihi ve toplanma durumu sipariş eklenip çıkarıldıkça güncellenir.
+# Filtreler (platform, tarih aralığı, arama) ham siparişler yerine bu görünüm üzerinde çalışır.
+import bisect
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from locations import fold_text
+from store import order_key
+from utils import order_dt
+
+# Bu durumdaki siparişler toplanacaklar listesine girmez
+KAPALI_DURUMLAR = ["tamamlandı", "teslim edildi", "iptal", "iptal edildi"]
+_KAPALI_KATLI = [fold_text(d) for d in KAPALI_DURUMLAR]
+
+
+def normalize_platform(plat):
+    plat = (plat or "").strip().lower()
+    if "trendyol" in plat:
+        return "trendyol"
+    if "hepsiburada" in plat:
+        return "hepsiburada"
+    if "amazon" in plat:
+        return "amazon"
+    if "n11" in plat:
+        return "n11"
+    if "ciceksepeti" in plat:
+        return "ciceksepeti"
+    if "pazarama" in plat:
+        return "pazarama"
+    if "idefix" in plat:
+        return "idefix"
+    return plat
+
+
+def is_open(order: Dict[str, Any]) -> bool:
+    # "İptal Edildi".lower() "i̇ptal" olur; durumlar Türkçe harflere duyarsız karşılaştırılır
+    durum = fold_text(order.get("store_order_status_name", ""))
+    return not any(anahtar in durum for anahtar in _KAPALI_KATLI)
+
+
+def group_key(urun: Dict[str, Any]) -> tuple:
+    # Ürün gruplama anahtarı (ad, barkod); lookup.ProductIndex da aynı anahtarı kullanır
+    return (urun.get("name", "") or "", str(urun.get("barcode", "") or ""))
+
+
+def _days_ago(dt: Optional[datetime], now: datetime) -> str:
+    return f"-{(now - dt).days} gün" if dt else ""
+
+
+class _Line:
+    __slots__ = ("key", "gkey", "order", "urun", "platform", "adet", "dt", "siparis_no")
+
+    def __init__(self, key, gkey, order, urun, platform, dt):
+        self.key = key
+        self.gkey = gkey
+        self.order = order
+        self.urun = urun
+        self.platform = platform
+        self.adet = int(urun.get("quantity", 1))
+        self.dt = dt
+        self.siparis_no = order.get("order_number", order.get("order_no", order.get("id", "")))
+
+
+class _Group:
+    __slots__ = ("name", "barcode", "stock_code", "picture", "lines", "adet", "platform_adet", "collected", "oldest",
+                 "search_text")
+
+    def __init__(self, urun):
+        self.name = urun.get("name", "")
+        self.barcode = urun.get("barcode", "")
+        self.stock_code = urun.get("store_stock_code", "")
+        self.picture = urun.get("picture", "")
+        self.lines: List[_Line] = []
+        self.adet = 0
+        self.platform_adet: Dict[str, int] = {}
+        self.collected = 0
+        self.oldest: Optional[datetime] = None
+        # Arama için katlanmış ad/barkod/stok kodu (alanlar arası eşleşme olmasın diye satır sonuyla ayrılır)
+        self.search_text = "\n".join(fold_text(t) for t in (self.name, self.barcode, self.stock_code))
+
+    def add(self, line: _Line):
+        self.lines.append(line)
+        self.adet += line.adet
+        if line.platform:
+            self.platform_adet[line.platform] = self.platform_adet.get(line.platform, 0) + line.adet
+        if line.urun.get("collected", False):
+            self.collected += 1
+        if line.dt and (self.oldest is None or line.dt < self.oldest):
+            self.oldest = line.dt
+
+    def remove_order(self, key):
+        kalan = [ln for ln in self.lines if ln.key != key]
+        if len(kalan) == len(self.lines):
+            return
+        self.lines = []
+        self.adet = 0
+        self.platform_adet = {}
+        self.collected = 0
+        self.oldest = None
+        for ln in kalan:
+            self.add(ln)
+
+    def row(self, lines: List[_Line], now: datetime) -> Dict[str, Any]:
+        # get_depo_urunler'in eskiden döndürdüğü sözlük yapısı (şablonlar ve DepoPencere bunu bekliyor)
+        if lines is self.lines:
+            adet, oldest = self.adet, self.oldest
+            collected = self.collected == len(lines)
+        else:
+            adet = sum(ln.adet for ln in lines)
+            oldest = min((ln.dt for ln in lines if ln.dt), default=None)
+            collected = all(ln.urun.get("collected", False) for ln in lines)
+        platformlar: Dict[str, List[Dict[str, Any]]] = {}
+        for ln in lines:
+            if ln.platform:
+                platformlar.setdefault(ln.platform, []).append({"adet": ln.adet, "siparis_no": ln.siparis_no})
+        return {
+            "name": self.name,
+            "barcode": self.barcode,
+            "stock_code": self.stock_code,
+            "picture": self.picture,
+            "adet": adet,
+            "days_ago": _days_ago(oldest, now),
+            "oldest": oldest,
+            "orders": [(ln.order, ln.urun) for ln in lines],
+            "platformlar": platformlar,
+            "_collected": collected,
+        }
+
+
+class Picklist:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._groups: Dict[tuple, _Group] = {}
+        self._sorted: List[tuple] = []  # (ad küçük harf, grup anahtarı), ada göre sıralı
+        self._orders: Dict[str, Dict[str, Any]] = {}
+        self._order_lines: Dict[str, List[_Line]] = {}  # sipariş -> satırları (order_product sırasıyla)
+
+    # ---------------- Güncelleme ----------------
+    def add_order(self, order: Dict[str, Any]):
+        with self._lock:
+            key = order_key(order)
+            if key in self._orders:
+                self.remove_order(key)
+            self._orders[key] = order
+            if not is_open(order):
+                return
+            platform = normalize_platform(order.get("entegration", "")).upper()
+            dt = order_dt(order)
+            lines = []
+            for urun in order.get("order_product", []):
+                gkey = group_key(urun)
+                group = self._groups.get(gkey)
+                if group is None:
+                    group = self._groups[gkey] = _Group(urun)
+                    bisect.insort(self._sorted, (gkey[0].lower(), gkey))
+                line = _Line(key, gkey, order, urun, platform, dt)
+                group.add(line)
+                lines.append(line)
+            self._order_lines[key] = lines
+
+    def remove_order(self, key):
+        with self._lock:
+            self._orders.pop(key, None)
+            for gkey in {ln.gkey for ln in self._order_lines.pop(key, [])}:
+                group = self._groups[gkey]
+                group.remove_order(key)
+                if not group.lines:
+                    del self._groups[gkey]
+                    i = bisect.bisect_left(self._sorted, (gkey[0].lower(), gkey))
+                    if i < len(self._sorted) and self._sorted[i][1] == gkey:
+                        del self._sorted[i]
+
+    def sync(self, orders: List[Dict[str, Any]]):
+        # Yeni sipariş listesini mevcut görünümle karşılaştırır; sadece değişen siparişler yeniden gruplanır
+        with self._lock:
+            seen = set()
+            for o in orders:
+                key = order_key(o)
+                seen.add(key)
+                old = self._orders.get(key)
+                if old is o:
+                    continue
+                if old is not None and old == o:
+                    self._rebind(key, o)
+                else:
+                    self.add_order(o)
+            for key in [k for k in self._orders if k not in seen]:
+                self.remove_order(key)
+
+    def recount_collected(self, barcode):
+        # Satırlardaki "collected" bayrakları yerinde değiştiyse (bkz. snapshot.apply_collected) sayaçları tazele
+        with self._lock:
+            for gkey, group in self._groups.items():
+                if gkey[1] == str(barcode):
+                    group.collected = sum(1 for ln in group.lines if ln.urun.get("collected", False))
+
+    def _rebind(self, key, order):
+        # İçerik aynı, nesne yeni: satırları yeni sipariş nesnesine bağla (eski görüntü bellekte kalmasın)
+        self._orders[key] = order
+        for ln, urun in zip(self._order_lines.get(key, []), order.get("order_product", [])):
+            ln.order = order
+            ln.urun = urun
+
+    # ---------------- Sorgu ----------------
+    def query(self, platform_filter=None, date_start=None, date_end=None, arama_terimi=None,
+              gkeys=None, order_keys=None) -> List[Dict[str, Any]]:
+        # gkeys verilirse sadece o (ad, barkod) grupları (tek kartı yenilemek için).
+        # order_keys verilirse sadece o siparişlerin satırları gezilir (tarih aralığındaki siparişler,
+        # bkz. OrderSnapshot.keys_between). Tarih aralığı verilince tarihi çözülemeyen satırlar dışarıda kalır.
+        platform = None
+        if platform_filter and platform_filter.strip().upper() != "TÜMÜ":
+            platform = platform_filter.strip().upper()
+        at = fold_text(arama_terimi) if arama_terimi else None
+        now = datetime.now()
+        out = []
+        with self._lock:
+            window: Optional[Dict[tuple, List[_Line]]] = None
+            if order_keys is not None:
+                window = {}
+                for key in order_keys:
+                    for ln in self._order_lines.get(key, ()):
+                        window.setdefault(ln.gkey, []).append(ln)
+                sirali = sorted((g[0].lower(), g) for g in window if gkeys is None or g in gkeys)
+            else:
+                sirali = self._sorted if gkeys is None else [(None, g) for g in gkeys if g in self._groups]
+            for _ad, gkey in sirali:
+                group = self._groups[gkey]
+                if platform and platform not in group.platform_adet:
+                    continue
+                if at and at not in group.search_text:
+                    continue
+                lines = group.lines if window is None else window[gkey]
+                if platform or date_start or date_end:
+                    lines = [
+                        ln for ln in lines
+                        if (not platform or ln.platform == platform)
+                        and (not date_start or (ln.dt is not None and ln.dt >= date_start))
+                        and (not date_end or (ln.dt is not None and ln.dt <= date_end))
+                    ]
+                    if not lines:
+                        continue
+                out.append(group.row(lines, now))
+        return out
+
+
+def get_depo_urunler(siparisler, platform_filter=None, date_start=None, date_end=None, arama_terimi=None):
+    # Eski arayüz: verilen sipariş listesinden tek seferlik görünüm kurup sorgular
+    pl = Picklist()
+    pl.sync(siparisler)
+    return pl.query(platform_filter, date_start, date_end, arama_terimi)
@@ -0,0 +1,68 @@
+# route.py
+# Toplama rotası: toplanacak ürünleri depo yerlerine göre yürüme sırasına dizer, istenirse sepetlere böler.
+# Depo yeri "bölge.koridor.raf.göz" biçimindedir (örn. "6.8.2.5"; "-", "/" ve boşluk da ayraç sayılır).
+# S-şekli (serpentine) sezgisi: sadece ürün olan koridorlara girilir; bölge ve koridor sırasıyla gidilir,
+# toplayıcı bir koridoru baştan sona, sonrakini sondan başa yürür (geri dönüş yolu olmaz).
+# Yeri olmayan ya da çözülemeyen ürünler listenin sonuna, ada göre eklenir.
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+_SEP = re.compile(r"[.\-/\s,;]+")
+
+
+def _part(p: str) -> tuple:
+    # Sayılar sayı olarak karşılaştırılır ("10" > "9"); harfli parçalar ("A", "B2") metin olarak, sayılardan sonra
+    return (0, int(p), "") if p.isdigit() else (1, 0, p.casefold())
+
+
+def parse_location(code) -> Optional[Tuple[tuple, tuple, tuple, tuple]]:
+    # "6.8.2.5" -> (bölge, koridor, raf, göz); eksik parçalar en başta sayılır, boşsa None
+    parts = [p for p in _SEP.split(str(code or "").strip()) if p]
+    if not parts:
+        return None
+    parts = parts[:3] + ["-".join(parts[3:])] if len(parts) > 4 else parts
+    keys = [_part(p) for p in parts]
+    keys += [(-1, 0, "")] * (4 - len(keys))
+    return tuple(keys)
+
+
+def route_sort(items: List[Dict[str, Any]], location_of: Callable[[Dict[str, Any]], str]) -> List[Dict[str, Any]]:
+    # items rota sırasında; her ürüne "rota_sira" (1'den başlayan adım no) yazılır
+    placed: Dict[tuple, List[tuple]] = {}
+    unplaced = []
+    for u in items:
+        loc = parse_location(location_of(u))
+        if loc is None:
+            unplaced.append(u)
+        else:
+            zone, aisle, shelf, bin_ = loc
+            placed.setdefault((zone, aisle), []).append(((shelf, bin_), u))
+    out: List[Dict[str, Any]] = []
+    for i, aisle_key in enumerate(sorted(placed)):
+        # Ürün olan koridorlar sırayla; tek sıradakiler ileri, çift sıradakiler geri yürünür
+        stops = sorted(placed[aisle_key], key=lambda s: (s[0], s[1].get("name") or ""), reverse=i % 2 == 1)
+        out.extend(u for _pos, u in stops)
+    out.extend(sorted(unplaced, key=lambda u: u.get("name") or ""))
+    for n, u in enumerate(out, 1):
+        u["rota_sira"] = n
+    return out
+
+
+def split_batches(items: List[Dict[str, Any]], capacity: int) -> List[List[Dict[str, Any]]]:
+    # Rota sırasındaki ürünleri sepet kapasitesine (adet) göre ardışık turlara böler; capacity <= 0 ise tek tur.
+    # Tek başına kapasiteyi aşan ürün kendi turunu alır (bölünmez: aynı ürün iki sepete dağılmasın).
+    if capacity <= 0:
+        return [items] if items else []
+    batches: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    load = 0
+    for u in items:
+        adet = int(u.get("adet") or 0)
+        if current and load + adet > capacity:
+            batches.append(current)
+            current, load = [], 0
+        current.append(u)
+        load += adet
+    if current:
+        batches.append(current)
+    return batches
@@ -0,0 +1,127 @@
+# scheduler.py
+# Web sunucusu içinde arka plan sipariş senkronizasyonu.
+# Gunicorn altında (preload_app=True, N worker) "lider" kilidini alan tek worker periyodik senkronize eder;
+# diğerleri sadece okur ve her turda kilidi tekrar dener (lider worker yeniden başlatılırsa görevi biri devralır).
+# Aynı anda gelen çalıştırma istekleri (zamanlayıcı + /refresh) tek çalıştırmada birleştirilir.
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from config import settings
+from locks import FileLock
+from sync import load_sync_state
+
+log = logging.getLogger("scheduler")
+
+
+class SyncScheduler:
+    def __init__(self, sync_func: Callable[[], Dict[str, Any]], interval: float = None, jitter: float = None,
+                 lock_path: str = None):
+        self.sync_func = sync_func
+        self.interval = settings.SYNC_INTERVAL_SECONDS if interval is None else interval
+        self.jitter = settings.SYNC_JITTER_SECONDS if jitter is None else jitter
+        lock_path = lock_path or settings.SYNC_LOCK
+        # Lider kilidi worker yaşadıkça tutulur; çalıştırma kilidi sadece senkronizasyon sürerken
+        # (lider olmayan bir worker'a gelen elle yenileme liderle çakışmasın diye)
+        self._leader_lock = FileLock(lock_path)
+        self._run_lock = FileLock(lock_path + ".run")
+        self._task: Optional[asyncio.Task] = None
+        self._current: Optional[asyncio.Future] = None
+        self.status: Dict[str, Any] = {
+            "leader": False,
+            "running": False,
+            "runs": 0,
+            "last_started": None,
+            "last_finished": None,
+            "last_duration": None,
+            "last_result": None,
+            "last_error": None,
+            "next_run": None,
+        }
+
+    # ---------------- Yaşam döngüsü ----------------
+    def start(self):
+        if self.interval <= 0 or self._task is not None:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._leader_lock.release()
+        self.status["leader"] = False
+
+    async def _loop(self):
+        # İlk tur kısa bir gecikmeyle; worker'lar aynı anda açılınca API'ye hep birlikte gitmesin
+        delay = random.uniform(0, self.jitter) + 5
+        while True:
+            self.status["next_run"] = datetime.fromtimestamp(time.time() + delay).isoformat(timespec="seconds")
+            await asyncio.sleep(delay)
+            if not self._leader_lock.locked:
+                self.status["leader"] = self._leader_lock.acquire(blocking=False)
+            if self.status["leader"]:
+                try:
+                    await self.run_now()
+                except Exception:
+                    pass  # hata status["last_error"]'da; döngü devam eder
+            delay = self.interval + random.uniform(-self.jitter, self.jitter)
+            delay = max(delay, 1)
+
+    # ---------------- Çalıştırma ----------------
+    async def run_now(self) -> Optional[Dict[str, Any]]:
+        # Süren bir çalıştırma varsa yenisi başlamaz, onun sonucu beklenir.
+        # Başka bir worker o an senkronize ediyorsa None döner.
+        if self._current is not None:
+            return await asyncio.shield(self._current)
+        loop = asyncio.get_running_loop()
+        self._current = loop.create_future()
+        fut = self._current
+        try:
+            result = await loop.run_in_executor(None, self._run_locked)
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()  # bekleyen yoksa "never retrieved" uyarısı çıkmasın
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            self._current = None
+
+    def _run_locked(self) -> Optional[Dict[str, Any]]:
+        if not self._run_lock.acquire(blocking=False):
+            return None
+        st = self.status
+        started = time.monotonic()
+        st["running"] = True
+        st["last_started"] = datetime.now().isoformat(timespec="seconds")
+        try:
+            result = self.sync_func()
+            st["last_result"] = result
+            st["last_error"] = None
+            return result
+        except Exception as e:
+            st["last_error"] = f"{type(e).__name__}: {e}"
+            log.exception("Arka plan senkronizasyonu başarısız")
+            raise
+        finally:
+            st["running"] = False
+            st["runs"] += 1
+            st["last_finished"] = datetime.now().isoformat(timespec="seconds")
+            st["last_duration"] = round(time.monotonic() - started, 3)
+            self._run_lock.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        # Bu worker'ın durumu + tüm worker'ların paylaştığı son senkronizasyon işareti
+        out = dict(self.status)
+        out["interval"] = self.interval
+        out["last_synced_at"] = load_sync_state().get("last_synced_at")
+        return out
@@ -0,0 +1,132 @@
+# search.py
+# Siparişlerde tam metin arama: bellek içi ters indeks (kelime -> siparişler).
+# Metinler fold_text ile katlanır: Türkçe I/İ/ı farkı ve aksanlar (ş, ğ, ç, ö, ü) aramayı bozmaz.
+# Her sorgu kelimesi, siparişteki bir kelimenin öneki olmalı (sıralı kelime listesinde bisect ile aralık).
+# Sonuçlar alan ağırlıklarına göre puanlanır (sipariş no / barkod > müşteri > ürün adı > adres), eşitlikte yeni önce.
+# İndeks Picklist gibi senkronlanır: yeni görüntüde sadece değişen siparişler yeniden indekslenir.
+import bisect
+import re
+import threading
+from typing import Any, Dict, List, Tuple
+
+from locations import fold_text
+from store import order_key
+from utils import order_ts
+
+_WORD = re.compile(r"\w+")
+EXACT_BONUS = 2  # kelimenin tamamı eşleşirse (önek değil) puan katı
+
+
+def tokens(text) -> List[str]:
+    return _WORD.findall(fold_text(text))
+
+
+def _order_fields(o: Dict[str, Any]) -> List[Tuple[Any, int]]:
+    # (metin, ağırlık)
+    fields = [
+        (o.get("no"), 10),
+        (o.get("order_number"), 10),
+        (f"{o.get('firstname', '')} {o.get('lastname', '')}", 6),
+        (o.get("mobil_phone") or o.get("telephone"), 6),
+        (o.get("ship_address"), 1),
+        (o.get("invoice_address"), 1),
+        (o.get("entegration"), 1),
+        (o.get("cargo_company"), 1),
+    ]
+    for u in o.get("order_product", []) or []:
+        fields.extend(((u.get("barcode"), 8), (u.get("store_stock_code"), 8), (u.get("name"), 3)))
+    return fields
+
+
+def _order_tokens(o: Dict[str, Any]) -> Dict[str, int]:
+    out: Dict[str, int] = {}
+    for text, weight in _order_fields(o):
+        if not text:
+            continue
+        for tok in tokens(text):
+            if weight > out.get(tok, 0):
+                out[tok] = weight
+    return out
+
+
+class SearchIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._orders: Dict[str, Dict[str, Any]] = {}
+        self._order_tokens: Dict[str, Dict[str, int]] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}  # kelime -> sipariş anahtarı -> ağırlık
+        self._words: List[str] = []  # _postings'in anahtarları, sıralı
+
+    # ---------------- Güncelleme ----------------
+    def add_order(self, order: Dict[str, Any]):
+        with self._lock:
+            key = order_key(order)
+            if key in self._orders:
+                self.remove_order(key)
+            self._orders[key] = order
+            toks = self._order_tokens[key] = _order_tokens(order)
+            for tok, weight in toks.items():
+                posting = self._postings.get(tok)
+                if posting is None:
+                    posting = self._postings[tok] = {}
+                    bisect.insort(self._words, tok)
+                posting[key] = weight
+
+    def remove_order(self, key):
+        with self._lock:
+            self._orders.pop(key, None)
+            for tok in self._order_tokens.pop(key, {}):
+                posting = self._postings[tok]
+                posting.pop(key, None)
+                if not posting:
+                    del self._postings[tok]
+                    del self._words[bisect.bisect_left(self._words, tok)]
+
+    def sync(self, orders: List[Dict[str, Any]]):
+        # Picklist.sync ile aynı: sadece yeni/değişen siparişler yeniden indekslenir, kaybolanlar çıkarılır
+        with self._lock:
+            seen = set()
+            for o in orders:
+                key = order_key(o)
+                seen.add(key)
+                old = self._orders.get(key)
+                if old is o:
+                    continue
+                if old is not None and old == o:
+                    self._orders[key] = o
+                else:
+                    self.add_order(o)
+            for key in [k for k in self._orders if k not in seen]:
+                self.remove_order(key)
+
+    # ---------------- Sorgu ----------------
+    def match(self, q) -> Dict[str, int]:
+        # Sorgudaki bütün kelimeleri (önek olarak) içeren siparişler: anahtar -> puan
+        qtokens = sorted(set(tokens(q)), key=len, reverse=True)
+        if not qtokens:
+            return {}
+        scores = None
+        with self._lock:
+            for qt in qtokens:
+                lo = bisect.bisect_left(self._words, qt)
+                hi = bisect.bisect_left(self._words, qt + "\uffff")
+                part: Dict[str, int] = {}
+                for word in self._words[lo:hi]:
+                    bonus = EXACT_BONUS if word == qt else 1
+                    for key, weight in self._postings[word].items():
+                        if scores is not None and key not in scores:
+                            continue
+                        if weight * bonus > part.get(key, 0):
+                            part[key] = weight * bonus
+                scores = part if scores is None else {k: v + part[k] for k, v in scores.items() if k in part}
+                if not scores:
+                    return {}
+        return scores
+
+    def search(self, q, limit: int = 20) -> List[Tuple[Dict[str, Any], int]]:
+        # (sipariş, puan) çiftleri; puana göre, eşitlikte yeni sipariş önce
+        scores = self.match(q)
+        with self._lock:
+            hits = [(self._orders[k], s) for k, s in scores.items() if k in self._orders]
+        hits.sort(key=lambda h: (-h[1], -(order_ts(h[0]) or 0)))
+        return hits[:limit]
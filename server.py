@@ -1,13 +1,20 @@
 # server.py
 from fastapi import FastAPI, Request, Form, UploadFile, File
-from fastapi.responses import HTMLResponse, RedirectResponse, PlainTextResponse, Response
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import HTMLResponse, RedirectResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Mapping
 from datetime import datetime
 from fastapi.responses import JSONResponse 
 from TokenAlEntegra import entegrabilisim_token_al  
-import json, csv, os, logging
+import json, os, logging
+import hashlib
+import asyncio
+import functools
+import re
+from collections import ChainMap
+from urllib.parse import urlencode
+import anyio
+from markupsafe import Markup
 
 # Configure logging for production
 logging.basicConfig(
@@ -16,13 +23,29 @@ logging.basicConfig(
 )
 
 # Gerekli fonksiyonlar
-from api import read_orders, save_orders_to_json
-from utils import calc_days_ago, delete_order, add_to_done_orders
-from depo import get_depo_urunler
+from api import read_orders, save_orders_to_json, set_collected, complete_order
+from events import get_events
+from config import settings
+from locks import atomic_write
+from utils import calc_days_ago, order_dt, parse_filter_date
+from snapshot import get_orders_snapshot, order_search_scores, query_picklist, search_orders
+from locations import fold_text, get_locations_store, open_csv_upload, read_csv_rows, write_csv_rows
+from store import file_version, order_key
+from fragments import FragmentCache
+from assets import CachedStaticFiles, STATIC_DIR, static_url
+from compression import CompressionMiddleware
+from thumbs import get_thumbs
+from route import route_sort, split_batches
 
 # API çekme fonksiyon adayları
 _fetch_candidates = []
 _merge_candidate = None
+_sync_candidate = None
+try:
+    # Son senkronizasyondan bu yana değişenleri çekip sayfalar geldikçe birleştiren yol (tercih edilir)
+    from sync import sync_orders
+    _sync_candidate = sync_orders
+except: pass
 try:
     from api import entegrabilisim_get_all_orders
     _fetch_candidates.append(entegrabilisim_get_all_orders)
@@ -41,16 +64,44 @@ try:
 except: pass
 
 app = FastAPI(title="Depo Web Application", version="1.0.0")
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Sayfalar (çok sayıda benzer kart) sıkıştırılarak gönderilir; SSE akışı hariç (bkz. compression.py)
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESS_MIN_SIZE)
+app.mount("/static", CachedStaticFiles(directory=STATIC_DIR), name="static")
 templates = Jinja2Templates(directory="templates")
+templates.env.globals["static_url"] = static_url
+
+def _evkey(value) -> str:
+    # SSE olay adında / hx-trigger'da kullanılabilir hale getir (sipariş no, barkod)
+    return re.sub(r"[^A-Za-z0-9_-]", "_", str(value))
+
+templates.env.filters["evkey"] = _evkey
 
 # Railway için port configuration
 PORT = int(os.environ.get("PORT", 8000))
 
 OUTPUT_JSON = "output.json"
-LOCATIONS_CSV = "locations.csv"
 TOKEN_PATH = "token.txt"
 
+# ---------------- Engelleyici işler ----------------
+# Dosya okuma/yazma ve API çağrıları olay döngüsünü kilitlemesin diye sınırlı iş parçacıklarında çalışır.
+# Ağ çağrıları (yenileme, token) ayrı ve küçük bir havuzdadır: yavaş bir yenileme sayfa isteklerini bekletmez.
+_limiters: Dict[str, Any] = {}
+
+def _limiter(name: str, size: int):
+    # CapacityLimiter olay döngüsü içinde (ve fork'tan sonra) oluşturulmalı
+    lim = _limiters.get(name)
+    if lim is None:
+        lim = _limiters[name] = anyio.CapacityLimiter(max(size, 1))
+    return lim
+
+async def _in_thread(fn, *args, **kwargs):
+    return await anyio.to_thread.run_sync(functools.partial(fn, *args, **kwargs),
+                                          limiter=_limiter("io", settings.IO_THREADS))
+
+async def _in_net_thread(fn, *args, **kwargs):
+    return await anyio.to_thread.run_sync(functools.partial(fn, *args, **kwargs),
+                                          limiter=_limiter("net", settings.NET_THREADS))
+
 # ---------------- Yardımcılar ----------------
 def _load_orders() -> List[Dict[str, Any]]:
     try:
@@ -65,63 +116,84 @@ def _save_orders(orders: List[Dict[str, Any]]):
         save_orders_to_json(orders, OUTPUT_JSON)
 
 def _color_for_order(order: Dict[str, Any]) -> str:
-    try:
-        dt = datetime.strptime(order.get("datetime", ""), "%Y-%m-%d %H:%M:%S")
-        hours = (datetime.now() - dt).total_seconds() / 3600
-        if hours >= 24:
-            return "#c62828"
-        elif hours >= 16:
-            return "#f8bb53"
-        elif dt.hour < 12:
-            return "#f87171"
-        else:
-            return "#5bc980"
-    except:
+    dt = order_dt(order)
+    if dt is None:
+        return "#5bc980"
+    hours = (datetime.now() - dt).total_seconds() / 3600
+    if hours >= 24:
+        return "#c62828"
+    elif hours >= 16:
+        return "#f8bb53"
+    elif dt.hour < 12:
+        return "#f87171"
+    else:
         return "#5bc980"
 
-def _enrich_order(o: Dict[str, Any]) -> Dict[str, Any]:
-    o = dict(o)
-    o["_color"] = _color_for_order(o)
-    o["_days_ago"] = calc_days_ago(o.get("datetime", ""))
-    
+def _enrich_order(o: Dict[str, Any]) -> Mapping[str, Any]:
+    # Şablonlar için görünüm: hesaplanan alanlar siparişin önüne eklenir, sipariş kopyalanmaz
+    extra = {
+        "_color": _color_for_order(o),
+        "_days_ago": calc_days_ago(order_dt(o)),
+    }
     # Ensure we have a valid grand_total, fallback to total if needed
     if not o.get("grand_total") or o.get("grand_total") == "0":
-        o["grand_total"] = o.get("total", "0")
+        extra["grand_total"] = o.get("total", "0")
     
     # Ensure firstname and lastname are not None
-    o["firstname"] = o.get("firstname", "")
-    o["lastname"] = o.get("lastname", "")
+    extra["firstname"] = o.get("firstname", "")
+    extra["lastname"] = o.get("lastname", "")
     
-    return o
-
-def _toggle_collected_by_barcode(barcode: str, value: bool) -> bool:
-    orders = _load_orders()
-    changed = False
-    for o in orders:
-        for u in o.get("order_product", []):
-            if str(u.get("barcode", "")) == str(barcode):
-                if u.get("collected") != value:
-                    u["collected"] = value
-                    changed = True
-    if changed:
-        _save_orders(orders)
-    return changed
-
-def _read_locations() -> Dict[str, str]:
-    if not os.path.exists(LOCATIONS_CSV):
-        return {}
-    out = {}
-    with open(LOCATIONS_CSV, "r", encoding="utf-8") as f:
-        for row in csv.reader(f):
-            if len(row) >= 2:
-                out[row[0]] = row[1]
-    return out
-
-def _write_locations(d: Dict[str, str]):
-    with open(LOCATIONS_CSV, "w", encoding="utf-8") as f:
-        w = csv.writer(f)
-        for k, v in sorted(d.items()):
-            w.writerow([k, v])
+    return ChainMap(extra, o)
+
+# ---------------- Kart önbelleği ----------------
+# Kartlar anahtarları kartta görünen alanlardan oluşan parçalar olarak önbelleğe alınır (bkz. fragments.py);
+# renk ve "-N gün" rozeti de anahtarda olduğundan zaman geçtikçe kart kendiliğinden yenilenir.
+_fragments = FragmentCache(settings.FRAGMENT_CACHE_SIZE)
+_ORDER_CARD_FIELDS = ("no", "firstname", "lastname", "datetime", "entegration", "cargo_company",
+                      "store_order_status_name", "grand_total", "_color", "_days_ago")
+_URUN_CARD_FIELDS = ("name", "barcode", "store_stock_code", "quantity", "picture", "collected", "depo_yeri")
+_PICK_CARD_FIELDS = ("name", "barcode", "stock_code", "adet", "days_ago", "picture", "_collected", "depo_yeri")
+
+def _render(template: str, **ctx) -> str:
+    return templates.get_template(template).render(**ctx)
+
+def _order_card(o: Mapping[str, Any], query: str) -> Markup:
+    key = ("order", query, len(o.get("order_product") or [])) + tuple(o.get(k) for k in _ORDER_CARD_FIELDS)
+    return _fragments.get(key, lambda: _render("_siparis_karti.html", o=o, query=query))
+
+def _urun_card(urun: Dict[str, Any], order_no) -> Markup:
+    key = ("urun", str(order_no)) + tuple(str(urun.get(k)) for k in _URUN_CARD_FIELDS)
+    return _fragments.get(key, lambda: _render("_urun_karti.html", urun=urun, order_no=order_no))
+
+def _pick_card(u: Dict[str, Any], query: str) -> Markup:
+    key = ("pick", query, tuple(u.get("platformlar") or ())) + tuple(str(u.get(k)) for k in _PICK_CARD_FIELDS)
+    return _fragments.get(key, lambda: _render("_toplama_karti.html", u=u, query=query))
+
+def _toggle_collected_by_barcode(barcode: str, value: bool, order_no: Optional[str] = None) -> bool:
+    # order_no verilirse sadece o siparişin satırı, yoksa barkodun geçtiği tüm satırlar
+    return set_collected(barcode, value, order_no) > 0
+
+def _location_lookup():
+    # ad -> depo yeri (normalize adla); bkz. locations.py
+    return get_locations_store().lookup()
+
+def _set_location(name: str, location: str):
+    get_locations_store().set(name, location)
+
+def _read_token() -> str:
+    if os.path.exists(TOKEN_PATH):
+        with open(TOKEN_PATH, "r", encoding="utf-8") as f:
+            return f.read().strip()
+    return ""
+
+def _write_token(token: str):
+    atomic_write(TOKEN_PATH, lambda f: f.write(token))
+
+def _confirm_order(order_no: str):
+    try:
+        complete_order(order_no)
+    except:
+        pass
 
 # ---------------- Health Check for Railway ----------------
 @app.get("/health")
@@ -134,7 +206,7 @@ async def refresh_token():
     try:
         # entegrabilisim_token_al() bazı projelerde sadece access döndürüyor,
         # bazılarında (access, refresh) tuple döndürüyor. İki duruma da uy.
-        result = entegrabilisim_token_al()
+        result = await _in_net_thread(entegrabilisim_token_al)
         access = None
         refresh = None
         if isinstance(result, tuple):
@@ -149,8 +221,7 @@ async def refresh_token():
             return JSONResponse({"status": "error", "message": "Token alınamadı"}, status_code=502)
 
         # Authorization başlığında beklenen format genelde "Bearer <token>"
-        with open(TOKEN_PATH, "w", encoding="utf-8") as f:
-            f.write(f"Bearer {str(access).strip()}")
+        await _in_thread(_write_token, f"Bearer {str(access).strip()}")
 
         # İstersen refresh'i de ayrıca saklamak için yorumdan çıkar:
         # with open("token.json", "w", encoding="utf-8") as jf:
@@ -163,56 +234,130 @@ async def refresh_token():
 # ---------------- Sayfalar ----------------
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request,
-                durum: str = "TÜMܢ",
+                durum: str = "TÜMÜ",
                 platform: str = "TÜMÜ",
                 kargo: str = "TÜMÜ",
                 t1: str = "",
-                t2: str = ""):
-    orders = _load_orders()
-    if durum == "TÜMÜ":
-        orders = [o for o in orders if "iptal" not in o.get("store_order_status_name", "").lower()]
-    # diğer filtreler
-    if platform != "TÜMÜ":
-        orders = [o for o in orders if o.get("entegration", "") == platform]
-    if kargo != "TÜMÜ":
-        orders = [o for o in orders if o.get("cargo_company", "") == kargo]
-    if t1:
-        d1 = datetime.strptime(t1, "%d.%m.%Y")
-        orders = [o for o in orders if datetime.strptime(o.get("datetime", ""), "%Y-%m-%d %H:%M:%S") >= d1]
-    if t2:
-        d2 = datetime.strptime(t2, "%d.%m.%Y")
-        orders = [o for o in orders if datetime.strptime(o.get("datetime", ""), "%Y-%m-%d %H:%M:%S") <= d2]
-    
+                t2: str = "",
+                q: str = ""):
+    snap = await _in_thread(get_orders_snapshot)
+    # İlk sayfa; devamı kaydırdıkça /orders/page'den gelir
+    page = await _in_thread(_orders_page, snap, durum, platform, kargo, t1, t2, "", q)
+
     # Remove the filter that only shows orders with collected products
     # orders = [o for o in orders if any(p.get("collected", False) for p in o.get("order_product", []))]
 
-    platformlar = sorted({o.get("entegration", "") for o in _load_orders() if o.get("entegration", "")})
-    kargolar = sorted({o.get("cargo_company", "") for o in _load_orders() if o.get("cargo_company", "")})
-    return templates.TemplateResponse("index.html", {
+    return templates.TemplateResponse("index.html", dict(page, **{
         "request": request,
-        "orders": [_enrich_order(o) for o in orders],
-        "platformlar": platformlar,
-        "kargolar": kargolar,
+        "platformlar": snap.platforms,
+        "kargolar": snap.cargos,
         "durum": durum, "platform": platform, "kargo": kargo,
-        "t1": t1, "t2": t2
-    })
+        "t1": t1, "t2": t2, "q": q,
+    }))
+
+@app.get("/orders/page", response_class=HTMLResponse)
+async def orders_page(request: Request,
+                      cursor: str = "",
+                      durum: str = "TÜMÜ",
+                      platform: str = "TÜMÜ",
+                      kargo: str = "TÜMÜ",
+                      t1: str = "",
+                      t2: str = "",
+                      q: str = ""):
+    # Sonraki sayfanın kartları + bir sonrakini yükleyecek öğe (hx-trigger="revealed")
+    snap = await _in_thread(get_orders_snapshot)
+    page = await _in_thread(_orders_page, snap, durum, platform, kargo, t1, t2, cursor, q)
+    return templates.TemplateResponse("_siparis_sayfasi.html", dict(page, request=request))
+
+def _orders_page(snap, durum: str, platform: str, kargo: str, t1: str, t2: str, cursor: str = "",
+                 q: str = "") -> Dict[str, Any]:
+    # cursor: "<yer>.<sipariş no>" (son gösterilen kart); boşsa ilk sayfa
+    orders, next_cursor = _page_orders(snap, durum, platform, kargo, t1, t2, cursor, settings.ORDERS_PAGE_SIZE, q)
+    query = urlencode({"durum": durum, "platform": platform, "kargo": kargo, "t1": t1, "t2": t2})
+    next_url = None
+    if next_cursor is not None:
+        next_url = "/orders/page?" + query + "&" + urlencode({"q": q, "cursor": next_cursor})
+    return {"cards": [_order_card(_enrich_order(o), query) for o in orders], "next_url": next_url}
+
+def _page_orders(snap, durum: str, platform: str, kargo: str, t1: str, t2: str, cursor: str, limit: int,
+                 q: str = ""):
+    # (sayfadaki siparişler, sonraki sayfanın cursor'ı ya da None)
+    after = -1
+    if cursor:
+        hint, _, no = cursor.partition(".")
+        after = snap.position(no, int(hint) if hint.isdigit() else -1)
+    # q: arama indeksine göre süzülür (bkz. search.py); liste sırası değişmez
+    hits = order_search_scores(q) if q.strip() else None
+    orders, last = snap.page(parse_filter_date(t1), parse_filter_date(t2, end_of_day=True), after,
+                             lambda o: _order_matches(o, durum, platform, kargo) and (hits is None or order_key(o) in hits),
+                             limit)
+    return orders, (f"{last}.{snap.orders[last].get('no')}" if last is not None else None)
+
+def _order_matches(o: Dict[str, Any], durum: str, platform: str, kargo: str) -> bool:
+    if durum == "TÜMÜ" and "iptal" in fold_text(o.get("store_order_status_name", "")):
+        return False
+    # diğer filtreler
+    if platform != "TÜMÜ" and o.get("entegration", "") != platform:
+        return False
+    if kargo != "TÜMÜ" and o.get("cargo_company", "") != kargo:
+        return False
+    return True
+
+@app.get("/search", response_class=HTMLResponse)
+async def search(request: Request, q: str = "", limit: int = 10):
+    # Arama kutusunun açılır sonuçları: puana göre siparişler ve adı/barkodu eşleşen ürünler
+    limit = max(1, min(limit, 50))
+
+    def find():
+        if not q.strip():
+            return [], []
+        index = get_orders_snapshot().products()
+        _match, keys = index.find_code(q)
+        if not keys:
+            keys = index.search(q, limit)
+        return search_orders(q, limit), [index.products[k] for k in keys[:limit]]
+    orders, urunler = await _in_thread(find)
+    return templates.TemplateResponse("_arama_sonuclari.html", {
+        "request": request, "q": q, "orders": orders, "urunler": urunler})
+
+@app.get("/order/{order_no}/card", response_class=HTMLResponse)
+async def order_card(request: Request, order_no: str,
+                     durum: str = "TÜMÜ",
+                     platform: str = "TÜMÜ",
+                     kargo: str = "TÜMÜ",
+                     t1: str = "",
+                     t2: str = ""):
+    # Tek sipariş kartı (SSE ile gelen değişiklikte sadece bu kart yenilenir).
+    # Sipariş artık yoksa ya da sayfanın filtrelerine uymuyorsa boş döner: kart sayfadan kalkar.
+    snap = await _in_thread(get_orders_snapshot)
+    order = snap.by_no.get(str(order_no))
+    if order is not None and (t1 or t2):
+        order = next((o for o in snap.between(parse_filter_date(t1), parse_filter_date(t2, end_of_day=True))
+                      if o is order), None)
+    if order is None or not _order_matches(order, durum, platform, kargo):
+        return HTMLResponse("")
+    return HTMLResponse(_order_card(_enrich_order(order), request.url.query))
 
 @app.get("/order/{order_no}", response_class=HTMLResponse)
 async def order_detail(request: Request, order_no: str):
-    orders = _load_orders()
-    order = next((o for o in orders if str(o.get("no")) == str(order_no)), None)
+    order = (await _in_thread(get_orders_snapshot)).by_no.get(str(order_no))
     if not order:
         return PlainTextResponse("Not Found", status_code=404)
-    return templates.TemplateResponse("depo.html", {"request": request, "order": _enrich_order(order)})
+    order = _enrich_order(order)
+    return templates.TemplateResponse("depo.html", {
+        "request": request, "order": order,
+        "urun_kartlari": [_urun_card(u, order["no"]) for u in order.get("order_product", [])]
+    })
 
 # ---------------- Toplandı Toggle ----------------
 @app.post("/toggle-collected")
 async def toggle_collected(request: Request):
     form = await request.form()
     barcode = form.get("barcode")
+    order_no = form.get("order_no") or None
     value = form.get("value")
     value = str(value).lower() in ("true", "1", "on", "yes")
-    _toggle_collected_by_barcode(barcode, value)
+    await _in_thread(_toggle_collected_by_barcode, barcode, value, order_no)
     return Response(status_code=204)
 
 @app.post("/picklist/toggle")
@@ -222,52 +367,332 @@ async def picklist_toggle(request: Request):
 # ---------------- Onayla + Yazdır ----------------
 @app.post("/order/{order_no}/print")
 async def order_print(order_no: str):
-    try:
-        delete_order(order_no)
-        add_to_done_orders(order_no)
-    except:
-        pass
+    await _in_thread(_confirm_order, order_no)
     return RedirectResponse(url="/", status_code=303)
 
 # ---------------- Picklist ----------------
 @app.get("/picklist", response_class=HTMLResponse)
-async def picklist(request: Request, platform: str = "TÜMÜ", t1: str = "", t2: str = "", q: str = ""):
-    d1 = datetime.strptime(t1, "%d.%m.%Y") if t1 else None
-    d2 = datetime.strptime(t2, "%d.%m.%Y") if t2 else None
-    urunler = get_depo_urunler(_load_orders(), platform, d1, d2, q)
-    locs = _read_locations()
+async def picklist(request: Request, platform: str = "TÜMÜ", t1: str = "", t2: str = "", q: str = "",
+                   sirala: str = "ad", sepet: str = ""):
+    # sirala=rota: depo yerine göre yürüme sırası, sepet>0 ise o kadar adetlik turlara bölünür (bkz. route.py)
+    d1 = parse_filter_date(t1)
+    d2 = parse_filter_date(t2, end_of_day=True)
+    urunler = [u for u in await _in_thread(query_picklist, platform, d1, d2, q) if not u["_collected"]]
+    yer = await _in_thread(_location_lookup)
+    query = _picklist_query(platform, t1, t2, q)
     for u in urunler:
-        u["depo_yeri"] = locs.get(u["name"], "")
-        all_collected = all(pr.get("collected", False) for (_o, pr) in u.get("orders", []))
-        u["_collected"] = all_collected
-    urunler = [u for u in urunler if not u["_collected"]]
+        u["depo_yeri"] = yer(u["name"])
+    # Form boş sepet alanını "sepet=" olarak gönderir: boş ya da sayı değilse varsayılan kapasite
+    sepet = int(sepet) if sepet.strip().isdigit() else settings.PICK_CART_CAPACITY
+    if sirala == "rota":
+        turlar = split_batches(route_sort(urunler, lambda u: u["depo_yeri"]), sepet)
+    else:
+        turlar = [urunler] if urunler else []
     return templates.TemplateResponse("picklist.html", {
-        "request": request, "urunler": urunler,
-        "platform": platform, "t1": t1, "t2": t2, "q": q
+        "request": request,
+        "turlar": [{"adet": sum(u["adet"] for u in tur), "kartlar": [_pick_card(u, query) for u in tur]}
+                   for tur in turlar],
+        "platform": platform, "t1": t1, "t2": t2, "q": q, "sirala": sirala, "sepet": sepet,
     })
 
+def _picklist_query(platform: str, t1: str, t2: str, q: str) -> str:
+    return urlencode({"platform": platform, "t1": t1, "t2": t2, "q": q})
+
+@app.get("/picklist/item", response_class=HTMLResponse)
+async def picklist_item(request: Request, name: str = "", barcode: str = "",
+                        platform: str = "TÜMÜ", t1: str = "", t2: str = "", q: str = ""):
+    # Tek ürün kartı; ürün tamamen toplandıysa ya da listeden çıktıysa boş döner
+    d1 = parse_filter_date(t1)
+    d2 = parse_filter_date(t2, end_of_day=True)
+    urunler = await _in_thread(query_picklist, platform, d1, d2, q, [(name, barcode)])
+    if not urunler or urunler[0]["_collected"]:
+        return HTMLResponse("")
+    u = urunler[0]
+    u["depo_yeri"] = (await _in_thread(_location_lookup))(u["name"])
+    return HTMLResponse(_pick_card(u, _picklist_query(platform, t1, t2, q)))
+
+# ---------------- Ürün resimleri ----------------
+# Pazaryeri resimleri yerine küçültülmüş, diskte önbelleklenmiş kopyaları (bkz. thumbs.py).
+# Sadece siparişlerde geçen resim adresleri indirilir (vekil başka adreslere istek atmak için kullanılamasın).
+def thumb_url(picture: str, size: int = None) -> str:
+    if not picture:
+        return ""
+    return "/img?" + urlencode({"u": picture, "s": size or settings.THUMB_SIZE})
+
+templates.env.globals["thumb_url"] = thumb_url
+
+@app.get("/img")
+async def product_image(request: Request, u: str = "", s: int = 0):
+    size = max(32, min(s or settings.THUMB_SIZE, 512))
+    snap = await _in_thread(get_orders_snapshot)
+    if u not in snap.pictures():
+        return PlainTextResponse("Not Found", status_code=404)
+    thumbs = get_thumbs()
+    hit = await _in_thread(thumbs.get, u, size)
+    # İndirilemeyen resim yerine yer tutucu; kısa süre önbelleklenir ki sonra tekrar denensin
+    digest, data = hit or thumbs.placeholder(size)
+    headers = {"ETag": f'"{digest}"',
+               "Cache-Control": "public, max-age=604800" if hit else "public, max-age=300"}
+    if _not_modified(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(data, media_type="image/jpeg", headers=headers)
+
+# ---------------- JSON API ----------------
+# Sayfalarla aynı filtreler; fields=a,b ile alan seçimi, limit + cursor ile sayfalama.
+# ETag depo sürümünden (ve istekteki parametrelerden) türetilir: If-None-Match eşleşirse 304 döner,
+# yani değişiklik yokken yoklama (polling) yapan istemci için sipariş listesi hiç işlenmez.
+API_MAX_LIMIT = 1000
+
+def _data_version(snap):
+    # Depo sürümü + yazma-arkası modunda görüntüye uygulanan günlük kayıtları
+    return (snap.version, snap.journal_cursor[2] if snap.journal_cursor else None)
+
+def _etag(*parts) -> str:
+    return '"' + hashlib.sha1(repr(parts).encode("utf-8")).hexdigest() + '"'
+
+def _not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in tags or "W/" + etag in tags
+
+def _project(row: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    # fields boşsa "_" ile başlayan iç alanlar dışındaki her şey
+    if fields:
+        return {k: row.get(k) for k in fields}
+    return {k: v for k, v in row.items() if not k.startswith("_")}
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def _api_response(request: Request, etag: str, build) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    body = json.dumps(build(), ensure_ascii=False, default=_json_default)
+    return Response(body, media_type="application/json", headers=headers)
+
+def _api_params(request: Request):
+    return sorted(request.query_params.multi_items())
+
+@app.get("/api/orders")
+async def api_orders(request: Request,
+                     durum: str = "TÜMÜ",
+                     platform: str = "TÜMÜ",
+                     kargo: str = "TÜMÜ",
+                     t1: str = "",
+                     t2: str = "",
+                     q: str = "",
+                     fields: str = "",
+                     limit: int = 100,
+                     cursor: str = ""):
+    snap = await _in_thread(get_orders_snapshot)
+    etag = _etag("orders", _data_version(snap), _api_params(request))
+    limit = max(1, min(limit, API_MAX_LIMIT))
+    field_list = [f.strip() for f in fields.split(",") if f.strip()]
+
+    def build():
+        orders, next_cursor = _page_orders(snap, durum, platform, kargo, t1, t2, cursor, limit, q)
+        return {"orders": [_project(o, field_list) for o in orders], "count": len(orders), "next_cursor": next_cursor}
+    return await _in_thread(_api_response, request, etag, build)
+
+@app.get("/api/picklist")
+async def api_picklist(request: Request,
+                       platform: str = "TÜMÜ",
+                       t1: str = "",
+                       t2: str = "",
+                       q: str = "",
+                       fields: str = "",
+                       limit: int = 100,
+                       cursor: str = ""):
+    snap = await _in_thread(get_orders_snapshot)
+    # "days_ago" güne bağlı, "depo_yeri" depo yerleri dosyasına: ikisi de ETag'e girer
+    etag = _etag("picklist", _data_version(snap), await _in_thread(lambda: get_locations_store().version()),
+                 datetime.now().date(), _api_params(request))
+    limit = max(1, min(limit, API_MAX_LIMIT))
+    start = int(cursor) if cursor.isdigit() else 0
+    field_list = [f.strip() for f in fields.split(",") if f.strip()]
+
+    def build():
+        d1 = parse_filter_date(t1)
+        d2 = parse_filter_date(t2, end_of_day=True)
+        urunler = [u for u in query_picklist(platform, d1, d2, q, snap=snap) if not u["_collected"]]
+        yer = _location_lookup()
+        page = urunler[start:start + limit]
+        # "orders" (sipariş, satır) çiftleri yerine sadece sipariş numaraları
+        rows = [_project(dict(u, depo_yeri=yer(u["name"]),
+                              orders=[o.get("no") for o, _satir in u.get("orders", [])]), field_list)
+                for u in page]
+        next_cursor = str(start + limit) if start + limit < len(urunler) else None
+        return {"items": rows, "count": len(rows), "total": len(urunler), "next_cursor": next_cursor}
+    return await _in_thread(_api_response, request, etag, build)
+
+# ---------------- Barkod okuyucu ----------------
+# El terminali tek istekte ürünü, depo yerini ve açık sipariş satırlarını alır (bkz. lookup.py).
+# Kod önce barkod, sonra stok kodu olarak aranır; ikisi de tutmazsa ürün adı öneki olarak.
+SCAN_MAX_RESULTS = 20
+
+def _scan(code: str, limit: int) -> Dict[str, Any]:
+    snap = get_orders_snapshot()
+    index = snap.products()
+    match, keys = index.find_code(code)
+    if not keys:
+        keys = index.search(code, limit)
+        match = "name" if keys else ""
+    yer = _location_lookup()
+    products = []
+    for key in keys[:limit]:
+        p = index.products[key]
+        lines = []
+        for o, u in index.open_lines(key):
+            lines.append({
+                "order_no": o.get("no"),
+                "order_number": o.get("order_number"),
+                "platform": o.get("entegration", ""),
+                "cargo": o.get("cargo_company", ""),
+                "customer": f"{o.get('firstname', '')} {o.get('lastname', '')}".strip(),
+                "datetime": o.get("datetime", ""),
+                "quantity": int(u.get("quantity", 1)),
+                "collected": bool(u.get("collected", False)),
+            })
+        products.append(dict(p, thumb=thumb_url(p["picture"]), location=yer(p["name"]),
+                             open_quantity=sum(ln["quantity"] for ln in lines if not ln["collected"]),
+                             lines=lines))
+    return {"code": code, "match": match, "products": products}
+
+@app.get("/scan/{code}")
+async def scan(code: str, limit: int = SCAN_MAX_RESULTS):
+    result = await _in_thread(_scan, code, max(1, min(limit, SCAN_MAX_RESULTS)))
+    return JSONResponse(result, status_code=200 if result["products"] else 404,
+                        headers={"Cache-Control": "no-store"})
+
+# ---------------- Canlı güncellemeler (SSE) ----------------
+# Olay günlüğü (events.py) izlenir; her olay etkilediği kartların adlarıyla ("order-<no>", "item-<barkod>")
+# gönderilir. Sayfalardaki kartlar hx-trigger="sse:<ad>" ile sadece kendilerini yeniden ister.
+SSE_POLL_SECONDS = 1.0
+SSE_PING_SECONDS = 15.0
+
+def _sse_names(event: Dict[str, Any], snap) -> List[str]:
+    names: List[str] = []
+    op = event.get("op")
+
+    def items_of(no):
+        o = snap.by_no.get(str(no)) or {}
+        for u in o.get("order_product", []) or []:
+            names.append("item-" + _evkey(u.get("barcode", "")))
+
+    if op == "collected":
+        names.append("item-" + _evkey(event.get("barcode", "")))
+        if event.get("order_no"):
+            names.append("order-" + _evkey(event["order_no"]))
+        else:
+            names.extend("order-" + _evkey(o.get("no")) for o, _u in snap.lines_for_barcode(event.get("barcode", "")))
+    elif op in ("cancel", "complete"):
+        names.append("order-" + _evkey(event.get("order_no", "")))
+        names.extend("item-" + _evkey(b) for b in event.get("barcodes", []))
+    elif op == "merge":
+        for no in event.get("updated", []):
+            names.append("order-" + _evkey(no))
+            items_of(no)
+        for no in event.get("inserted", []):
+            items_of(no)
+        if event.get("inserted"):
+            names.append("orders-changed")
+    return list(dict.fromkeys(names))
+
+@app.get("/events")
+async def events_stream(request: Request):
+    events = get_events()
+    last_id = request.headers.get("last-event-id", "")
+    if last_id.isdigit():
+        # Yeniden bağlanan tarayıcı kaldığı yerden devam eder
+        cursor = (None, 0, int(last_id))
+    else:
+        cursor = await _in_thread(events.cursor)
+
+    async def stream():
+        nonlocal cursor
+        yield "retry: 3000\n\n"
+        version = None
+        idle = 0.0
+        while not await request.is_disconnected():
+            v = await _in_thread(file_version, events.journal.path)
+            if v != version:
+                version = v
+                records, new_cursor = await _in_thread(events.tail, cursor)
+                if records and cursor[2] and records[0]["seq"] > cursor[2] + 1:
+                    # Arada sıkıştırılıp silinmiş olaylar var: hangi kartların değiştiği bilinmiyor
+                    yield f"id: {records[-1]['seq']}\nevent: reload\ndata: {records[-1]['seq']}\n\n"
+                elif records:
+                    snap = await _in_thread(get_orders_snapshot)
+                    for r in records:
+                        for name in _sse_names(r, snap):
+                            yield f"id: {r['seq']}\nevent: {name}\ndata: {r['seq']}\n\n"
+                cursor = new_cursor
+                if records:
+                    idle = 0.0
+            if idle >= SSE_PING_SECONDS:
+                yield ": ping\n\n"
+                idle = 0.0
+            await asyncio.sleep(SSE_POLL_SECONDS)
+            idle += SSE_POLL_SECONDS
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/live/notice", response_class=HTMLResponse)
+async def live_notice():
+    return HTMLResponse('<div class="live-notice">Listede yeni değişiklikler var.'
+                        '<a href="javascript:location.reload()">Yenile</a></div>')
+
 # ---------------- Depo Yerleri ----------------
 @app.get("/locations", response_class=HTMLResponse)
 async def locations_page(request: Request, q: str = ""):
-    items = [{"name": n, "location": l} for n, l in _read_locations().items()]
-    if q:
-        ql = q.lower()
-        items = [it for it in items if ql in it["name"].lower()]
+    items = [{"name": n, "location": l} for n, l in await _in_thread(lambda: get_locations_store().items(q))]
     return templates.TemplateResponse("locations.html", {"request": request, "items": items, "q": q})
 
 @app.post("/locations/set")
 async def locations_set(name: str = Form(...), location: str = Form(...)):
-    locs = _read_locations()
-    locs[name] = location
-    _write_locations(locs)
+    await _in_thread(_set_location, name, location)
     return RedirectResponse(url="/locations", status_code=303)
 
+def _import_locations(raw, dry_run: bool):
+    changes: List[tuple] = []
+    counts = get_locations_store().import_rows(read_csv_rows(open_csv_upload(raw)), dry_run=dry_run,
+                                               changes=changes)
+    return counts, changes
+
+@app.post("/locations/import")
+async def locations_import(request: Request, file: UploadFile = File(...), dry_run: bool = Form(False)):
+    # Dosya satır satır okunur ve LOCATIONS_IMPORT_BATCH'lik işlemlerle yazılır; dry_run=1 ise sadece fark raporu.
+    # Yeri boş satırlar atlanır (silme /locations/set ile yapılır).
+    try:
+        counts, changes = await _in_thread(_import_locations, file.file, dry_run)
+    finally:
+        await file.close()
+    if "application/json" in request.headers.get("accept", ""):
+        return JSONResponse({"dry_run": dry_run, "counts": counts,
+                             "changes": [{"action": a, "name": n, "old": o, "new": v} for a, n, o, v in changes]})
+    return templates.TemplateResponse("locations.html", {
+        "request": request, "items": [], "q": "",
+        "report": {"dry_run": dry_run, "counts": counts, "changes": changes, "filename": file.filename}})
+
+@app.get("/locations/export")
+async def locations_export():
+    # Tüm eşleme sırayla okunup parça parça gönderilir (tablo belleğe alınmaz); parçalar thread'de üretilir
+    store = await _in_thread(get_locations_store)
+    body = write_csv_rows(store.export_rows())
+    return StreamingResponse(body, media_type="text/csv",
+                             headers={"Content-Disposition": 'attachment; filename="locations.csv"',
+                                      "Cache-Control": "no-store"})
+
 # ---------------- Token ----------------
 @app.get("/token", response_class=HTMLResponse)
 async def token_form(request: Request):
-    cur = ""
-    if os.path.exists(TOKEN_PATH):
-        cur = open(TOKEN_PATH, "r", encoding="utf-8").read().strip()
+    cur = await _in_thread(_read_token)
     return HTMLResponse(f"""
     <html><body>
     <form method="post" action="/token">
@@ -279,13 +704,55 @@ async def token_form(request: Request):
 
 @app.post("/token")
 async def token_save(token: str = Form(...)):
-    with open(TOKEN_PATH, "w", encoding="utf-8") as f:
-        f.write(token.strip())
+    await _in_thread(_write_token, token.strip())
     return RedirectResponse(url="/token", status_code=303)
 
+# ---------------- Arka plan senkronizasyonu ----------------
+_scheduler = None
+if _sync_candidate:
+    from scheduler import SyncScheduler
+    _scheduler = SyncScheduler(lambda: _sync_candidate(path=OUTPUT_JSON))
+
+@app.on_event("startup")
+async def _start_scheduler():
+    # preload_app=True: kilit fork'tan sonra, her worker'ın kendi olay döngüsünde alınır
+    if _scheduler:
+        _scheduler.start()
+    # Olay günlüğünü sıkıştırır; önceki bir çökmeden kalan işlenmemiş olaylar ilk turda depoya işlenir
+    get_events().start()
+
+@app.on_event("shutdown")
+async def _stop_scheduler():
+    if _scheduler:
+        await _scheduler.stop()
+    await _in_thread(get_events().stop)
+
+@app.get("/sync/status")
+async def sync_status():
+    if not _scheduler:
+        return JSONResponse({"enabled": False})
+    # snapshot() sync_state.json'u diskten okur
+    return JSONResponse({"enabled": True, **(await _in_thread(_scheduler.snapshot))})
+
 # ---------------- API'den Güncelle ----------------
 @app.post("/refresh")
 async def refresh_from_api():
+    if _scheduler:
+        # Bu worker'da süren bir senkronizasyon varsa ona katılır; başka worker'da sürüyorsa beklemeden döner.
+        # Hata (token, ağ) buton için 500 olmasın: loglanır, ayrıntısı /sync/status'ta görünür
+        try:
+            sonuc = await _scheduler.run_now()
+        except Exception:
+            logging.exception("API'den güncelleme başarısız")
+            return Response(status_code=204)
+        if sonuc:
+            logging.info(f"Senkronizasyon: {sonuc['inserted']} yeni, {sonuc['updated']} güncellenen, {sonuc['skipped']} atlanan")
+        return Response(status_code=204)
+    await _in_net_thread(_legacy_refresh)
+    return Response(status_code=204)
+
+def _legacy_refresh():
+    # sync modülü yoksa: tüm siparişleri çekip birleştiren eski yol
     new_orders = []
     for fn in _fetch_candidates:
         try:
@@ -296,18 +763,16 @@ async def refresh_from_api():
         except:
             pass
     if not new_orders:
-        return Response(status_code=204)
+        return
     if _merge_candidate:
         try:
             _merge_candidate(new_orders, path=OUTPUT_JSON)
-            return Response(status_code=204)
         except TypeError:
             _merge_candidate(new_orders)
-            return Response(status_code=204)
+        return
     cur = _load_orders()
     by_no = {str(o.get("no") or o.get("order_number") or o.get("id")): o for o in cur}
     for n in new_orders:
         key = str(n.get("no") or n.get("order_number") or n.get("id"))
         by_no[key] = n
-    _save_orders(list(by_no.values()))
-    return Response(status_code=204)
\ No newline at end of file
+    _save_orders(list(by_no.values()))
\ No newline at end of file
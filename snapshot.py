@@ -0,0 +1,212 @@
+# snapshot.py
+# Siparişlerin bellek içi anlık görüntüsü.
+# Depo sürümü (store.version()) değişmedikçe diskten tekrar okunmaz.
+# Görüntüdeki listeler/sözlükler paylaşımlıdır: okuyanlar bunları DEĞİŞTİRMEMELİ, kopyalamalı.
+# Tek istisna toplanma bayrakları: yazma-arkası modunda henüz depoya yazılmamış değişiklikler
+# olay günlüğünden (bkz. events.py) okunup görüntüye burada, kilit altında uygulanır.
+import bisect
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from lookup import ProductIndex
+from picklist import Picklist
+from search import SearchIndex
+from store import file_version, get_store, order_key
+from utils import order_dt
+
+
+class OrderSnapshot:
+    def __init__(self, version, orders: List[Dict[str, Any]]):
+        self.version = version
+        self.orders = orders
+        self.by_no: Dict[str, Dict[str, Any]] = {}
+        for o in orders:
+            for k in (o.get("order_number"), o.get("no")):
+                if k:
+                    self.by_no[str(k)] = o
+        # Filtre seçenekleri (facet) bir kez hesaplanır
+        self.platforms = sorted({o.get("entegration", "") for o in orders if o.get("entegration", "")})
+        self.cargos = sorted({o.get("cargo_company", "") for o in orders if o.get("cargo_company", "")})
+        # Siparişlerin çözülmüş tarihleri (sıralarıyla; çözülemeyen None) görüntüyle birlikte bir kez hesaplanır.
+        # Tarihe göre sıralı indeks: bir tarih aralığı bisect ile bitişik bir dilime denk gelir
+        self.dates: List[Optional[datetime]] = [order_dt(o) for o in orders]
+        dated = sorted((dt, i) for i, dt in enumerate(self.dates) if dt is not None)
+        self._dt_keys = [dt for dt, _i in dated]
+        self._dt_pos = [i for _dt, i in dated]
+        self._by_barcode: Optional[Dict[str, list]] = None
+        self._pos: Optional[Dict[str, int]] = None
+        self._pictures: Optional[set] = None
+        self._products: Optional[ProductIndex] = None
+        self.journal_cursor = None
+
+    def lines_for_barcode(self, barcode) -> List[tuple]:
+        # (sipariş, satır) çiftleri; barkod indeksi ilk ihtiyaçta kurulur
+        if self._by_barcode is None:
+            by_barcode: Dict[str, list] = {}
+            for o in self.orders:
+                for u in o.get("order_product", []) or []:
+                    by_barcode.setdefault(str(u.get("barcode", "")), []).append((o, u))
+            self._by_barcode = by_barcode
+        return self._by_barcode.get(str(barcode), [])
+
+    def pictures(self) -> set:
+        # Siparişlerdeki ürün resmi adresleri (resim vekili sadece bunları indirir)
+        if self._pictures is None:
+            self._pictures = {u.get("picture") for o in self.orders for u in o.get("order_product", []) or []
+                              if u.get("picture")}
+        return self._pictures
+
+    def products(self) -> ProductIndex:
+        # Barkod / stok kodu / ad öneki indeksi (bkz. lookup.py); ilk ihtiyaçta kurulur
+        if self._products is None:
+            self._products = ProductIndex(self.orders)
+        return self._products
+
+    def collected_lines(self, barcode, value: bool, order_no=None) -> List[Dict[str, Any]]:
+        # Toplandı işareti value olarak değişecek satırlar
+        return [u for o, u in self.lines_for_barcode(barcode)
+                if (not order_no or str(o.get("no")) == str(order_no) or str(o.get("order_number")) == str(order_no))
+                and u.get("collected") != value]
+
+    def apply_collected(self, barcode, value: bool, order_no=None) -> int:
+        lines = self.collected_lines(barcode, value, order_no)
+        for u in lines:
+            u["collected"] = value
+        return len(lines)
+
+    def between(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        # [start, end] aralığındaki siparişler (iki uç dahil), dosyadaki sıralarıyla.
+        # Aralık verilmezse tüm siparişler; verilirse tarihi çözülemeyenler dışarıda kalır.
+        if start is None and end is None:
+            return self.orders
+        return [self.orders[i] for i in self._positions(start, end)]
+
+    def keys_between(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> Optional[List[str]]:
+        # between() ile aynı pencere, sipariş anahtarları olarak; aralık verilmezse None (= tüm siparişler)
+        if start is None and end is None:
+            return None
+        return [order_key(self.orders[i]) for i in self._positions(start, end)]
+
+    def _positions(self, start: Optional[datetime], end: Optional[datetime]) -> List[int]:
+        lo = bisect.bisect_left(self._dt_keys, start) if start else 0
+        hi = bisect.bisect_right(self._dt_keys, end) if end else len(self._dt_keys)
+        return sorted(self._dt_pos[lo:hi])
+
+    def position(self, order_no, hint: int = -1) -> int:
+        # Siparişin listedeki yeri (sayfalama cursor'ı). hint'teki sipariş buysa doğrudan o;
+        # sipariş bu arada listeden çıktıysa (onaylandı, arşivlendi) hint'in bir öncesi.
+        if 0 <= hint < len(self.orders) and str(self.orders[hint].get("no")) == str(order_no):
+            return hint
+        if self._pos is None:
+            self._pos = {str(o.get("no")): i for i, o in enumerate(self.orders)}
+        return self._pos.get(str(order_no), min(hint, len(self.orders)) - 1)
+
+    def page(self, start: Optional[datetime], end: Optional[datetime], after: int,
+             match: Callable[[Dict[str, Any]], bool], limit: int) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        # between(start, end) içinde "after" yerinden sonraki, match'e uyan en fazla limit sipariş.
+        # (sayfa, sonraki sayfanın cursor'ı; son sayfaysa None). Sadece bir sayfa + 1 sipariş taranır.
+        if start is None and end is None:
+            positions = range(after + 1, len(self.orders))
+        else:
+            positions = self._positions(start, end)
+            positions = positions[bisect.bisect_right(positions, after):]
+        out: List[Dict[str, Any]] = []
+        last = after
+        for i in positions:
+            o = self.orders[i]
+            if match(o):
+                if len(out) == limit:
+                    return out, last
+                out.append(o)
+                last = i
+        return out, None
+
+
+_orders_lock = threading.RLock()
+_orders_snap: Optional[OrderSnapshot] = None
+# Toplanacaklar görünümü her yeni görüntüyle eşitlenir; sadece değişen siparişler yeniden gruplanır
+_picklist = Picklist()
+# Sipariş arama indeksi de aynı şekilde eşitlenir (bkz. search.py)
+_search = SearchIndex()
+# Depoya henüz yazılmamış toplanma değişikliklerinin günlüğü (bkz. events.py); None ise kapalı
+_overlay_journal = None
+_overlay_version = None
+
+
+def set_overlay_journal(journal):
+    global _overlay_journal
+    _overlay_journal = journal
+
+
+def get_orders_snapshot() -> OrderSnapshot:
+    global _orders_snap, _overlay_version
+    store = get_store()
+    version = store.version()
+    journal = _overlay_journal
+    jversion = file_version(journal.path) if journal else None
+    snap = _orders_snap
+    if snap is not None and snap.version == version and jversion == _overlay_version:
+        return snap
+    with _orders_lock:
+        snap = _orders_snap
+        if snap is None or snap.version != version:
+            snap = OrderSnapshot(version, store.read_orders())
+            _picklist.sync(snap.orders)
+            _search.sync(snap.orders)
+            _orders_snap = snap
+        if journal:
+            # Günlükte son okunandan beri eklenen kayıtlar (diğer worker'larınkiler dahil)
+            records, snap.journal_cursor = journal.read_from(snap.journal_cursor)
+            for r in records:
+                if r.get("op") == "collected" and not r.get("applied", True):
+                    _apply_collected(snap, r["barcode"], r["value"], r.get("order_no"))
+            _overlay_version = jversion
+        return snap
+
+
+def _apply_collected(snap: OrderSnapshot, barcode, value, order_no=None) -> int:
+    changed = snap.apply_collected(barcode, value, order_no)
+    if changed:
+        _picklist.recount_collected(barcode)
+    return changed
+
+
+def count_collected_changes(barcode, value: bool, order_no=None) -> int:
+    # apply_collected'ın kaç satırı değiştireceği (hiçbir şey değiştirmeden)
+    with _orders_lock:
+        return len(get_orders_snapshot().collected_lines(barcode, value, order_no))
+
+
+def apply_collected(barcode, value: bool, order_no=None) -> int:
+    # Değişikliği bellekteki görüntüye hemen uygular (depoya yazmadan)
+    with _orders_lock:
+        return _apply_collected(get_orders_snapshot(), barcode, value, order_no)
+
+
+def query_picklist(platform_filter=None, date_start=None, date_end=None, arama_terimi=None, gkeys=None,
+                   snap: Optional[OrderSnapshot] = None):
+    # gkeys: sadece bu (ad, barkod) grupları. Tarih aralığı sıralı tarih indeksinden çözülür (O(log n + k)) ve
+    # hazır görünümde sadece o siparişlerin satırları gezilir; tarihi çözülemeyenler between'deki gibi dışarıda kalır.
+    # snap: sonuç tam olarak bu görüntüden hesaplanır (ETag'i bu görüntüden türetilen API yanıtı için)
+    with _orders_lock:
+        current = get_orders_snapshot()
+        if snap is None or snap is current:
+            return _picklist.query(platform_filter, None, None, arama_terimi, gkeys,
+                                   current.keys_between(date_start, date_end))
+    # Görüntü bu arada yenilendi: istenen görüntü için tek seferlik görünüm (nadir)
+    pl = Picklist()
+    pl.sync(snap.orders)
+    return pl.query(platform_filter, None, None, arama_terimi, gkeys, snap.keys_between(date_start, date_end))
+
+
+def search_orders(q, limit: int = 20) -> List[Tuple[Dict[str, Any], int]]:
+    # (sipariş, puan) çiftleri, en iyi eşleşme önce
+    get_orders_snapshot()
+    return _search.search(q, limit)
+
+
+def order_search_scores(q) -> Dict[str, int]:
+    # store.order_key(sipariş) -> puan; listeyi sorguya göre süzmek için
+    get_orders_snapshot()
+    return _search.match(q)
@@ -0,0 +1,495 @@
+# store.py
+# Sipariş deposu. İki arka uç var:
+#   - JsonOrderStore: eskisi gibi output.json + done_orders.json
+#   - SqliteOrderStore: WAL modunda SQLite, siparişler ve sipariş satırları ayrı tablolarda
+# Hangisinin kullanılacağı config.settings.ORDER_STORE ile seçilir ("json" / "sqlite").
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from config import settings
+from locks import atomic_write, path_lock
+
+JSON_PATH = settings.OUTPUT_JSON
+DONE_PATH = settings.DONE_JSON
+DB_PATH = settings.ORDER_DB
+
+
+class VersionConflict(RuntimeError):
+    # save_orders(expected_version=...): okunduğundan beri başka bir süreç/thread siparişleri değiştirmiş
+    pass
+
+
+def _stat_version(st):
+    # Atomik yazmada her seferinde yeni bir dosya (inode) oluşur
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def file_version(path: str):
+    # Dosya değişmedikçe aynı kalır; yoksa None
+    try:
+        return _stat_version(os.stat(path))
+    except OSError:
+        return None
+
+
+def _dump_json(data):
+    return lambda f: json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def order_key(o: Dict[str, Any]) -> str:
+    # Siparişin tekil anahtarı: önce "no", yoksa "order_number", yoksa "id"
+    return str(o.get("no") or o.get("order_number") or o.get("id"))
+
+
+def _is_done(o: Dict[str, Any], done: Set[str]) -> bool:
+    return str(o.get("no")) in done or str(o.get("order_number")) in done
+
+
+def _matches_no(o: Dict[str, Any], order_no) -> bool:
+    return str(o.get("no")) == str(order_no) or str(o.get("order_number")) == str(order_no)
+
+
+def _carry_local_state(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    # API'den gelen güncel sipariş (durum, kargo kodu vb.) + yerelde tutulan "collected" bayrakları
+    old_lines = old.get("order_product", []) or []
+    lines = []
+    for i, u in enumerate(new.get("order_product", []) or []):
+        prev = old_lines[i] if i < len(old_lines) and old_lines[i].get("barcode") == u.get("barcode") else None
+        if prev is None:
+            prev = next((x for x in old_lines if x.get("barcode") == u.get("barcode")), None)
+        if prev is not None and "collected" in prev and "collected" not in u:
+            u = dict(u)
+            u["collected"] = prev["collected"]
+        lines.append(u)
+    merged = dict(new)
+    merged["order_product"] = lines
+    return merged
+
+
+def _barcode_index(orders: List[Dict[str, Any]]) -> Dict[str, list]:
+    # barkod -> [(sipariş, satır)]
+    index: Dict[str, list] = {}
+    for o in orders:
+        for u in o.get("order_product", []) or []:
+            index.setdefault(str(u.get("barcode", "")), []).append((o, u))
+    return index
+
+
+# ---------------- JSON ----------------
+# Yazmalar geçici dosya + os.replace ile atomiktir; oku-değiştir-yaz işlemleri "<dosya>.lock" kilidi altında yapılır,
+# böylece birden fazla worker aynı anda toplanma bilgisi değiştirdiğinde güncelleme kaybolmaz.
+class JsonOrderStore:
+    def __init__(self, path: str = JSON_PATH, done_path: str = DONE_PATH):
+        self.path = path
+        self.done_path = done_path
+        # done_orders.json bellekte küme olarak tutulur, sadece dosya değişince yeniden okunur
+        self._done: Set[str] = set()
+        self._done_version = ()
+
+    def version(self):
+        # Önbellekler bunu karşılaştırır
+        return file_version(self.path)
+
+    def read_orders(self) -> List[Dict[str, Any]]:
+        return self.read_orders_versioned()[1]
+
+    def read_orders_versioned(self):
+        # (sürüm, siparişler). Dosya yoksa boş liste; bozuksa hata verir
+        # (boş liste dönüp üzerine yazılırsa tüm siparişler kaybolurdu).
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                version = _stat_version(os.fstat(f.fileno()))
+                text = f.read()
+        except FileNotFoundError:
+            return None, []
+        if not text.strip():
+            return version, []
+        return version, json.loads(text).get("orders", [])
+
+    def save_orders(self, orders: List[Dict[str, Any]], expected_version=None):
+        # expected_version verilirse (read_orders_versioned'dan) dosya o sürümde değilse VersionConflict
+        with path_lock(self.path):
+            if expected_version is not None and file_version(self.path) != expected_version:
+                raise VersionConflict(self.path)
+            self._write(orders)
+        return self.version()
+
+    def _write(self, orders: List[Dict[str, Any]]):
+        atomic_write(self.path, _dump_json({"orders": orders}))
+
+    def merge_orders(self, new_orders: Iterable[Dict[str, Any]], changes: Optional[list] = None) -> Dict[str, int]:
+        with path_lock(self.path):
+            return self._merge_orders(new_orders, changes)
+
+    def _merge_orders(self, new_orders: Iterable[Dict[str, Any]], changes: Optional[list] = None) -> Dict[str, int]:
+        # changes verilirse ("inserted" | "updated", sipariş anahtarı) çiftleri eklenir
+        # Yeni siparişler eklenir, mevcutlar API'deki haliyle güncellenir (toplanma bilgisi korunur).
+        # Sipariş anahtarı -> liste sırası eşlemesiyle her yeni sipariş O(1)'de bulunur.
+        done = self.done_set()
+        orders = self.read_orders()
+        pos = {order_key(o): i for i, o in enumerate(orders)}
+        counts = {"inserted": 0, "updated": 0, "skipped": 0}
+        for o in new_orders:
+            if _is_done(o, done):
+                counts["skipped"] += 1
+                continue
+            key = order_key(o)
+            i = pos.get(key)
+            if i is None:
+                pos[key] = len(orders)
+                orders.append(o)
+                counts["inserted"] += 1
+                if changes is not None:
+                    changes.append(("inserted", key))
+                continue
+            merged = _carry_local_state(orders[i], o)
+            if merged == orders[i]:
+                counts["skipped"] += 1
+                continue
+            orders[i] = merged
+            counts["updated"] += 1
+            if changes is not None:
+                changes.append(("updated", key))
+        if counts["inserted"] or counts["updated"]:
+            self._write(orders)
+        return counts
+
+    def delete_order(self, order_no) -> bool:
+        with path_lock(self.path):
+            orders = self.read_orders()
+            kalanlar = [o for o in orders if not _matches_no(o, order_no)]
+            # Yalnızca bulduysan güncelle!
+            if len(kalanlar) == len(orders):
+                return False
+            self._write(kalanlar)
+            return True
+
+    def set_collected(self, barcode, value: bool, order_no=None) -> int:
+        return self.set_collected_many([(barcode, value, order_no)])
+
+    def set_collected_many(self, changes: Iterable[tuple]) -> int:
+        # changes: (barkod, değer, sipariş no ya da None), sırayla. Kaç değişiklik olursa olsun dosya bir kez yazılır.
+        with path_lock(self.path):
+            orders = self.read_orders()
+            index = _barcode_index(orders)
+            changed = 0
+            for barcode, value, order_no in changes:
+                for o, u in index.get(str(barcode), ()):
+                    if order_no and not _matches_no(o, order_no):
+                        continue
+                    if u.get("collected") != value:
+                        u["collected"] = value
+                        changed += 1
+            if changed:
+                self._write(orders)
+            return changed
+
+    def done_set(self) -> Set[str]:
+        version = file_version(self.done_path)
+        if version != self._done_version:
+            try:
+                with open(self.done_path, "r", encoding="utf-8") as f:
+                    self._done = set(json.load(f)["orders"])
+            except Exception:
+                self._done = set()
+            self._done_version = version
+        return self._done
+
+    def add_done(self, order_no):
+        if str(order_no) in self.done_set():
+            return
+        with path_lock(self.done_path):
+            try:
+                with open(self.done_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except FileNotFoundError:
+                data = {"orders": []}
+            if str(order_no) not in data["orders"]:
+                data["orders"].append(str(order_no))
+            atomic_write(self.done_path, _dump_json(data))
+        self._done = set(data["orders"])
+        self._done_version = file_version(self.done_path)
+
+    def is_done(self, order_no) -> bool:
+        return str(order_no) in self.done_set()
+
+
+# ---------------- SQLite ----------------
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    no TEXT PRIMARY KEY,
+    order_number TEXT,
+    entegration TEXT,
+    cargo_company TEXT,
+    datetime TEXT,
+    store_order_status TEXT,
+    store_order_status_name TEXT,
+    pos INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS order_lines (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_no TEXT NOT NULL REFERENCES orders(no) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    barcode TEXT,
+    name TEXT,
+    collected INTEGER,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS done_orders (
+    no TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+CREATE INDEX IF NOT EXISTS idx_orders_order_number ON orders(order_number);
+CREATE INDEX IF NOT EXISTS idx_orders_entegration ON orders(entegration);
+CREATE INDEX IF NOT EXISTS idx_orders_cargo_company ON orders(cargo_company);
+CREATE INDEX IF NOT EXISTS idx_orders_datetime ON orders(datetime);
+CREATE INDEX IF NOT EXISTS idx_order_lines_order ON order_lines(order_no, idx);
+CREATE INDEX IF NOT EXISTS idx_order_lines_barcode ON order_lines(barcode);
+"""
+
+
+def _order_row(o: Dict[str, Any], pos: int):
+    head = {k: v for k, v in o.items() if k != "order_product"}
+    return (
+        order_key(o),
+        str(o.get("order_number", "") or ""),
+        o.get("entegration", "") or "",
+        o.get("cargo_company", "") or "",
+        o.get("datetime", "") or "",
+        str(o.get("store_order_status", "") or ""),
+        o.get("store_order_status_name", "") or "",
+        pos,
+        json.dumps(head, ensure_ascii=False),
+    )
+
+
+def _line_rows(o: Dict[str, Any]):
+    key = order_key(o)
+    for i, u in enumerate(o.get("order_product", []) or []):
+        body = {k: v for k, v in u.items() if k != "collected"}
+        collected = None if "collected" not in u else int(bool(u["collected"]))
+        yield (key, i, str(u.get("barcode", "") or ""), u.get("name", "") or "", collected,
+               json.dumps(body, ensure_ascii=False))
+
+
+class SqliteOrderStore:
+    def __init__(self, db_path: str = DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._con().executescript(_SCHEMA)
+
+    def _con(self) -> sqlite3.Connection:
+        # sqlite3 bağlantıları thread'ler arası paylaşılamaz; her thread kendi bağlantısını açar
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            con.execute("PRAGMA foreign_keys=ON")
+            self._local.con = con
+        return con
+
+    def _tx(self):
+        return Transaction(self._con())
+
+    def version(self):
+        # Her yazma işleminde artan sayaç (bkz. Transaction)
+        return self._con().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    def read_orders(self) -> List[Dict[str, Any]]:
+        return self.read_orders_versioned()[1]
+
+    def read_orders_versioned(self):
+        # (sürüm, siparişler); tek bir okuma işlemi içinde, yani tutarlı bir anlık görüntüden
+        con = self._con()
+        con.execute("BEGIN")
+        try:
+            version = con.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+            return version, self._read_all(con)
+        finally:
+            con.execute("COMMIT")
+
+    def _read_all(self, con: sqlite3.Connection) -> List[Dict[str, Any]]:
+        lines: Dict[str, List[Dict[str, Any]]] = {}
+        for order_no, collected, data in con.execute(
+                "SELECT order_no, collected, data FROM order_lines ORDER BY order_no, idx"):
+            u = json.loads(data)
+            if collected is not None:
+                u["collected"] = bool(collected)
+            lines.setdefault(order_no, []).append(u)
+        orders = []
+        for no, data in con.execute("SELECT no, data FROM orders ORDER BY pos"):
+            o = json.loads(data)
+            o["order_product"] = lines.get(no, [])
+            orders.append(o)
+        return orders
+
+    def save_orders(self, orders: List[Dict[str, Any]], expected_version=None):
+        with self._tx() as con:
+            if expected_version is not None and \
+                    con.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0] != expected_version:
+                raise VersionConflict(self.db_path)
+            con.execute("DELETE FROM order_lines")
+            con.execute("DELETE FROM orders")
+            self._insert(con, orders, 0)
+        return self.version()
+
+    def _insert(self, con: sqlite3.Connection, orders: Iterable[Dict[str, Any]], start_pos: int):
+        for pos, o in enumerate(orders, start_pos):
+            con.execute("DELETE FROM order_lines WHERE order_no = ?", (order_key(o),))
+            con.execute("INSERT OR REPLACE INTO orders VALUES (?,?,?,?,?,?,?,?,?)", _order_row(o, pos))
+            con.executemany(
+                "INSERT INTO order_lines (order_no, idx, barcode, name, collected, data) VALUES (?,?,?,?,?,?)",
+                list(_line_rows(o)))
+
+    def _load_order(self, con: sqlite3.Connection, key: str) -> Optional[Dict[str, Any]]:
+        row = con.execute("SELECT data FROM orders WHERE no = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        o = json.loads(row[0])
+        o["order_product"] = []
+        for collected, data in con.execute(
+                "SELECT collected, data FROM order_lines WHERE order_no = ? ORDER BY idx", (key,)):
+            u = json.loads(data)
+            if collected is not None:
+                u["collected"] = bool(collected)
+            o["order_product"].append(u)
+        return o
+
+    def merge_orders(self, new_orders: Iterable[Dict[str, Any]], changes: Optional[list] = None) -> Dict[str, int]:
+        # Yeni siparişler eklenir, mevcutlar API'deki haliyle güncellenir (toplanma bilgisi korunur).
+        # changes verilirse ("inserted" | "updated", sipariş anahtarı) çiftleri eklenir.
+        # Her sipariş için sadece birincil anahtar/done_orders indeksine bakılır: maliyet yeni sipariş sayısı kadar.
+        counts = {"inserted": 0, "updated": 0, "skipped": 0}
+        with self._tx() as con:
+            next_pos = con.execute("SELECT COALESCE(MAX(pos), -1) + 1 FROM orders").fetchone()[0]
+            for o in new_orders:
+                if con.execute("SELECT 1 FROM done_orders WHERE no IN (?, ?)",
+                               (str(o.get("no")), str(o.get("order_number")))).fetchone():
+                    counts["skipped"] += 1
+                    continue
+                key = order_key(o)
+                row = con.execute("SELECT pos FROM orders WHERE no = ?", (key,)).fetchone()
+                if row is None:
+                    self._insert(con, [o], next_pos)
+                    next_pos += 1
+                    counts["inserted"] += 1
+                    if changes is not None:
+                        changes.append(("inserted", key))
+                    continue
+                old = self._load_order(con, key)
+                merged = _carry_local_state(old, o)
+                if merged == old:
+                    counts["skipped"] += 1
+                    continue
+                self._insert(con, [merged], row[0])
+                counts["updated"] += 1
+                if changes is not None:
+                    changes.append(("updated", key))
+        return counts
+
+    def set_collected(self, barcode, value: bool, order_no=None) -> int:
+        return self.set_collected_many([(barcode, value, order_no)])
+
+    def set_collected_many(self, changes: Iterable[tuple]) -> int:
+        # changes: (barkod, değer, sipariş no ya da None), sırayla; hepsi tek işlemde.
+        # idx_order_lines_barcode sayesinde sadece ilgili satırlar güncellenir
+        changed = 0
+        with self._tx() as con:
+            for barcode, value, order_no in changes:
+                sql = "UPDATE order_lines SET collected = ? WHERE barcode = ? AND collected IS NOT ?"
+                args = [int(bool(value)), str(barcode), int(bool(value))]
+                if order_no:
+                    sql += " AND order_no IN (SELECT no FROM orders WHERE no = ? OR order_number = ?)"
+                    args += [str(order_no), str(order_no)]
+                changed += con.execute(sql, args).rowcount
+        return changed
+
+    def delete_order(self, order_no) -> bool:
+        with self._tx() as con:
+            cur = con.execute("DELETE FROM orders WHERE no = ? OR order_number = ?",
+                              (str(order_no), str(order_no)))
+            return cur.rowcount > 0
+
+    def done_set(self) -> Set[str]:
+        return {r[0] for r in self._con().execute("SELECT no FROM done_orders")}
+
+    def is_done(self, order_no) -> bool:
+        return self._con().execute("SELECT 1 FROM done_orders WHERE no = ?", (str(order_no),)).fetchone() is not None
+
+    def add_done(self, order_no):
+        with self._tx() as con:
+            con.execute("INSERT OR IGNORE INTO done_orders (no) VALUES (?)", (str(order_no),))
+
+    def import_json(self, json_path: str = JSON_PATH, done_path: str = DONE_PATH):
+        # Mevcut output.json ve done_orders.json içeriğini tek seferde veritabanına aktarır
+        src = JsonOrderStore(json_path, done_path)
+        orders = src.read_orders()
+        done = src.done_set()
+        with self._tx() as con:
+            con.executemany("INSERT OR IGNORE INTO done_orders (no) VALUES (?)", [(str(n),) for n in done])
+            con.execute("DELETE FROM order_lines")
+            con.execute("DELETE FROM orders")
+            self._insert(con, orders, 0)
+        return len(orders), len(done)
+
+
+class Transaction:
+    # "with" bloğu boyunca tek bir yazma işlemi (BEGIN IMMEDIATE ... COMMIT/ROLLBACK).
+    # Bir satır bile değiştiyse meta.version artırılır. locations.db de aynı meta tablosunu kullanır (bkz. locations.py).
+    def __init__(self, con: sqlite3.Connection):
+        self.con = con
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.con.execute("BEGIN IMMEDIATE")
+        self._changes = self.con.total_changes
+        return self.con
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type:
+            self.con.execute("ROLLBACK")
+            return False
+        if self.con.total_changes != self._changes:
+            self.con.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+        self.con.execute("COMMIT")
+        return False
+
+
+# ---------------- Seçim ----------------
+_stores: Dict[Any, Any] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path: Optional[str] = None):
+    # Varsayılan yol için ayarlardaki arka ucu, özel bir JSON yolu verilirse o dosyayı kullanır
+    if path and path != JSON_PATH:
+        return JsonOrderStore(path)
+    with _stores_lock:
+        store = _stores.get(settings.ORDER_STORE)
+        if store is None:
+            if settings.ORDER_STORE == "sqlite":
+                store = SqliteOrderStore(DB_PATH)
+            else:
+                store = JsonOrderStore(JSON_PATH, DONE_PATH)
+            _stores[settings.ORDER_STORE] = store
+        return store
+
+
+if __name__ == "__main__":
+    # Kullanım: python store.py import [output.json] [done_orders.json]
+    import sys
+    if len(sys.argv) >= 2 and sys.argv[1] == "import":
+        json_path = sys.argv[2] if len(sys.argv) > 2 else JSON_PATH
+        done_path = sys.argv[3] if len(sys.argv) > 3 else DONE_PATH
+        n_orders, n_done = SqliteOrderStore(DB_PATH).import_json(json_path, done_path)
+        print(f"{n_orders} sipariş ve {n_done} tamamlanmış sipariş {DB_PATH} dosyasına aktarıldı.")
+    else:
+        print("Kullanım: python store.py import [output.json] [done_orders.json]")
@@ -0,0 +1,72 @@
+# sync.py
+# Entegra'dan artımlı sipariş senkronizasyonu.
+# En son başarıyla senkronize edilen an (high-water mark) sync_state.json'da tutulur.
+# Her çalışmada sadece o andan (küçük bir örtüşmeyle) şimdiye kadarki siparişler istenir; kesinti sonrası
+# aradaki boşluk SYNC_CHUNK_HOURS'lık parçalar halinde, en fazla SYNC_MAX_BACKFILL_DAYS geriye doldurulur.
+import json
+from datetime import datetime, timedelta
+
+from api import entegrabilisim_iter_order_pages, merge_and_save_orders
+from config import settings
+from locks import atomic_write
+from store import JSON_PATH
+from utils import ORDER_DT_FORMAT, parse_order_datetime
+
+STATE_PATH = settings.SYNC_STATE
+
+
+def load_sync_state(path=STATE_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def save_sync_state(state, path=STATE_PATH):
+    atomic_write(path, lambda f: json.dump(state, f, ensure_ascii=False, indent=2))
+
+
+def sync_window(state, now, full=False):
+    # (başlangıç, bitiş): ilk çalışmada eskisi gibi son 18 saat, sonra son işaretten itibaren
+    last = None if full else parse_order_datetime(state.get("last_synced_at"))
+    if full:
+        start = now - timedelta(days=settings.SYNC_MAX_BACKFILL_DAYS)
+    elif last is None:
+        start = now - timedelta(hours=18)
+    else:
+        start = last - timedelta(minutes=settings.SYNC_OVERLAP_MINUTES)
+    return max(start, now - timedelta(days=settings.SYNC_MAX_BACKFILL_DAYS)), now
+
+
+def sync_orders(full=False, path=JSON_PATH, state_path=STATE_PATH):
+    state = load_sync_state(state_path)
+    now = datetime.now()
+    start, end = sync_window(state, now, full)
+    chunk = timedelta(hours=settings.SYNC_CHUNK_HOURS)
+    result = {"start": start.strftime(ORDER_DT_FORMAT), "end": end.strftime(ORDER_DT_FORMAT),
+              "fetched": 0, "inserted": 0, "updated": 0, "skipped": 0, "failed_pages": 0}
+    t = start
+    while t < end:
+        t_end = min(t + chunk, end)
+        errors = []
+        for orders in entegrabilisim_iter_order_pages(t, t_end, errors=errors):
+            counts = merge_and_save_orders(orders, path=path)
+            for k, n in counts.items():
+                result[k] += n
+            result["fetched"] += len(orders)
+        if errors:
+            # Eksik sayfa var: işaret ilerlemez, sonraki çalışma bu parçadan devam eder
+            result["failed_pages"] += len(errors)
+            break
+        state["last_synced_at"] = t_end.strftime(ORDER_DT_FORMAT)
+        save_sync_state(state, state_path)
+        t = t_end
+    result["last_synced_at"] = state.get("last_synced_at")
+    return result
+
+
+if __name__ == "__main__":
+    # Kullanım: python sync.py [--full]
+    import sys
+    print(sync_orders(full="--full" in sys.argv))
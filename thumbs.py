@@ -0,0 +1,184 @@
+# thumbs.py
+# Ürün resimleri için küçük resim (thumbnail) önbelleği; web sunucusu (/img) ve masaüstü (DepoPencere) ortak kullanır.
+# Pazaryeri resmi bir kez indirilir, Pillow ile küçültülüp JPEG olarak diske yazılır.
+# Disk içerik adreslidir: dosya adı küçük resmin kendi özetidir (aynı resim tek dosya, özet aynı zamanda ETag);
+# "index/" altındaki küçük dosyalar (adres, boyut) -> özet eşlemesini tutar. Son kullanılanlar bellekte (LRU).
+# İstenen boyut SIZE_BUCKETS'taki bir sonraki boyuta yuvarlanır: her piksel boyutu için kaynak resim yeniden indirilmez.
+# İndirilemeyen adresler bir süre tekrar denenmez; o arada yer tutucu resim döner.
+import bisect
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import requests
+from PIL import Image
+
+from config import settings
+from locks import atomic_write
+
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+FAIL_RETRY_SECONDS = 600
+PLACEHOLDER_COLOR = "#E0E7FF"
+SIZE_BUCKETS = (64, 96, 128, 170, 256, 340, 512)
+
+
+def bucket_size(size: int) -> int:
+    # İstenen boyutu karşılayan en küçük kova; en büyükten büyükse en büyük kova
+    i = bisect.bisect_left(SIZE_BUCKETS, size)
+    return SIZE_BUCKETS[min(i, len(SIZE_BUCKETS) - 1)]
+
+
+class ThumbCache:
+    def __init__(self, directory: str = None, mem_items: int = None, timeout: float = 5):
+        self.directory = directory or settings.THUMB_DIR
+        self.mem_items = settings.THUMB_MEM_ITEMS if mem_items is None else mem_items
+        self.timeout = timeout
+        self._mem: "OrderedDict[Tuple[str, int], Tuple[str, bytes]]" = OrderedDict()
+        self._failed: Dict[str, float] = {}  # adres -> son başarısız deneme (eskiden yeniye)
+        self._placeholders: Dict[int, Tuple[str, bytes]] = {}
+        self._lock = threading.Lock()
+        self._stripes = [threading.Lock() for _ in range(64)]
+
+    # ---------------- Okuma ----------------
+    def get(self, url: str, size: int) -> Optional[Tuple[str, bytes]]:
+        # (özet, JPEG baytları); resim alınamazsa None
+        key = (url, bucket_size(size))
+        hit = self._mem_get(key)
+        if hit is not None:
+            return hit
+        with self._key_lock(key):
+            # Aynı resmi aynı anda isteyenlerden sadece biri indirir
+            hit = self._mem_get(key) or self._disk_get(key)
+            if hit is None:
+                if self._recently_failed(url):
+                    return None
+                hit = self._fetch(key)
+                if hit is None:
+                    self._mark_failed(url)
+                    return None
+                with self._lock:
+                    self._failed.pop(url, None)
+            self._mem_put(key, hit)
+            return hit
+
+    def get_or_placeholder(self, url: str, size: int) -> Tuple[str, bytes]:
+        return (self.get(url, size) if url else None) or self.placeholder(size)
+
+    def placeholder(self, size: int) -> Tuple[str, bytes]:
+        size = bucket_size(size)
+        ph = self._placeholders.get(size)
+        if ph is None:
+            data = _encode(Image.new("RGB", (size, size), PLACEHOLDER_COLOR))
+            ph = self._placeholders[size] = (_digest(data), data)
+        return ph
+
+    def _mem_get(self, key):
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit is not None:
+                self._mem.move_to_end(key)
+            return hit
+
+    def _mem_put(self, key, value):
+        if self.mem_items <= 0:
+            return
+        with self._lock:
+            self._mem[key] = value
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.mem_items:
+                self._mem.popitem(last=False)
+
+    def _recently_failed(self, url: str) -> bool:
+        with self._lock:
+            failed_at = self._failed.get(url)
+        return failed_at is not None and time.monotonic() - failed_at < FAIL_RETRY_SECONDS
+
+    def _mark_failed(self, url: str):
+        # Kayıt bellekteki LRU kadar tutulur: önce süresi dolanlar, hâlâ fazlaysa en eskiler atılır
+        now = time.monotonic()
+        with self._lock:
+            self._failed.pop(url, None)
+            self._failed[url] = now
+            limit = max(self.mem_items, 1)
+            if len(self._failed) > limit:
+                for u in [u for u, t in self._failed.items() if now - t >= FAIL_RETRY_SECONDS]:
+                    del self._failed[u]
+                while len(self._failed) > limit:
+                    del self._failed[next(iter(self._failed))]
+
+    def _key_lock(self, key) -> threading.Lock:
+        return self._stripes[hash(key) % len(self._stripes)]
+
+    # ---------------- Disk ----------------
+    def _index_path(self, key) -> str:
+        url, size = key
+        return os.path.join(self.directory, "index", hashlib.sha256(url.encode("utf-8")).hexdigest() + f"_{size}")
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest + ".jpg")
+
+    def _disk_get(self, key):
+        try:
+            with open(self._index_path(key), "r", encoding="utf-8") as f:
+                digest = f.read().strip()
+            with open(self._blob_path(digest), "rb") as f:
+                return digest, f.read()
+        except (OSError, ValueError):
+            return None
+
+    def _fetch(self, key):
+        url, size = key
+        try:
+            with requests.get(url, timeout=self.timeout, stream=True) as resp:
+                resp.raise_for_status()
+                raw = resp.raw.read(MAX_SOURCE_BYTES + 1, decode_content=True)
+            if len(raw) > MAX_SOURCE_BYTES:
+                return None
+            im = Image.open(io.BytesIO(raw))
+            im.thumbnail((size, size))
+            data = _encode(im)
+        except Exception:
+            return None
+        digest = _digest(data)
+        blob = self._blob_path(digest)
+        index = self._index_path(key)
+        try:
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            os.makedirs(os.path.dirname(index), exist_ok=True)
+            if not os.path.exists(blob):
+                atomic_write(blob, lambda f: f.write(data), binary=True)
+            atomic_write(index, lambda f: f.write(digest))
+        except OSError:
+            pass  # disk yazılamasa da küçük resim bellekten sunulur
+        return digest, data
+
+
+def _encode(im: "Image.Image") -> bytes:
+    if im.mode not in ("RGB", "L"):
+        # Saydam PNG'ler beyaz zemin üzerine
+        rgba = im.convert("RGBA")
+        im = Image.new("RGB", rgba.size, "#ffffff")
+        im.paste(rgba, mask=rgba.split()[-1])
+    buf = io.BytesIO()
+    im.save(buf, "JPEG", quality=82, optimize=True)
+    return buf.getvalue()
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+_instance: Optional[ThumbCache] = None
+_instance_lock = threading.Lock()
+
+
+def get_thumbs() -> ThumbCache:
+    global _instance
+    with _instance_lock:
+        if _instance is None:
+            _instance = ThumbCache()
+        return _instance
@@ -1,62 +1,69 @@
-from datetime import datetime
-import json
-import os
+from datetime import datetime, timedelta
+from functools import lru_cache
 
-def calc_days_ago(order_date):
+ORDER_DT_FORMAT = "%Y-%m-%d %H:%M:%S"
+FILTER_DATE_FORMAT = "%d.%m.%Y"
+
+# ---------------- Sipariş tarihleri ----------------
+# Siparişin "datetime" metni bir kez çözülür; sonuç metne göre önbellekte tutulur (sipariş sözlüğüne yazılmaz,
+# yani dosyaya/veritabanına da gitmez). Çözülemeyen tarihler None olur; hatalı tarih kontrolü sadece burada yapılır.
+def parse_order_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.strptime(value, ORDER_DT_FORMAT)
+    except (TypeError, ValueError):
+        return None
+
+@lru_cache(maxsize=65536)
+def _parse_cached(value):
+    return parse_order_datetime(value)
+
+def order_dt(order):
+    value = order.get("datetime", "")
+    if isinstance(value, str):
+        return _parse_cached(value)
+    return parse_order_datetime(value)
+
+def order_ts(order):
+    # Sıralama anahtarı (bu süreç içinde karşılaştırmak için; saklanmaz)
+    dt = order_dt(order)
+    return dt.timestamp() if dt else None
+
+def parse_filter_date(value, end_of_day=False):
+    # Filtre kutusundaki "GG.AA.YYYY"; end_of_day=True ise o günün son anı (t2 o günü de kapsasın)
     try:
-        sip_tarih = datetime.strptime(order_date, "%Y-%m-%d %H:%M:%S")
-        bugun = datetime.now()
-        fark = (bugun - sip_tarih).days
-        return f"-{fark} gün"
-    except:
+        d = datetime.strptime((value or "").strip(), FILTER_DATE_FORMAT)
+    except ValueError:
+        return None
+    if end_of_day:
+        d = d + timedelta(days=1) - timedelta(microseconds=1)
+    return d
+
+def calc_days_ago(order_date):
+    # order_date: "YYYY-MM-DD HH:MM:SS" metni veya datetime
+    sip_tarih = parse_order_datetime(order_date)
+    if sip_tarih is None:
         return ""
+    fark = (datetime.now() - sip_tarih).days
+    return f"-{fark} gün"
 
 def get_hour(order_date):
-    try:
-        sip_tarih = datetime.strptime(order_date, "%Y-%m-%d %H:%M:%S")
-        return sip_tarih.hour
-    except:
-        return 0
+    sip_tarih = parse_order_datetime(order_date)
+    return sip_tarih.hour if sip_tarih else 0
 
 def unique_list(lst):
     return sorted(list({x for x in lst if x and x.strip()}))
 
 
 def delete_order(order_no):
-    out_file = "output.json"
-    with open(out_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    kalanlar = []
-    silinen = None
-    for sip in data["orders"]:
-        # Sipariş no'yu hem "no" hem "order_number" alanında kontrol et
-        if (
-            str(sip.get("no")) == str(order_no)
-            or str(sip.get("order_number")) == str(order_no)
-        ):
-            silinen = sip
-        else:
-            kalanlar.append(sip)
-    # Yalnızca bulduysan güncelle!
-    if silinen:
-        data["orders"] = kalanlar
-        with open(out_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+    # Sipariş no'yu hem "no" hem "order_number" alanında kontrol eder
+    from store import get_store
+    if get_store().delete_order(order_no):
         print(f"Sipariş {order_no} silindi.")
     else:
         print("Sipariş bulunamadı, hiçbir şey silinmedi!")
 
 def add_to_done_orders(order_no):
-    file = 'done_orders.json'
-    try:
-        with open(file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except FileNotFoundError:
-        data = {"orders": []}
-    if str(order_no) not in data["orders"]:
-        data["orders"].append(str(order_no))
-    with open(file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-
-
-
+    from store import get_store
+    get_store().add_done(order_no)
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+# vendor_assets.py
+# Sayfaların kullandığı JS kütüphanelerini static/vendor/ altına indirir. Dosyalar repoda (commit'li) durur ve
+# base.html onları içerik özetli adresle sunar; bu betik sadece sürüm yükseltirken çalıştırılır (--force).
+# Sürüm değiştirirken dosya adını (ve base.html'deki adresi) da değiştirin.
+import os
+import sys
+import urllib.request
+
+from locks import atomic_write
+
+VENDOR_DIR = os.path.join("static", "vendor")
+
+ASSETS = {
+    "htmx-1.9.10.min.js": "https://unpkg.com/htmx.org@1.9.10/dist/htmx.min.js",
+    "htmx-sse-1.9.10.js": "https://unpkg.com/htmx.org@1.9.10/dist/ext/sse.js",
+}
+
+
+def main():
+    os.makedirs(VENDOR_DIR, exist_ok=True)
+    failed = 0
+    for name, url in ASSETS.items():
+        path = os.path.join(VENDOR_DIR, name)
+        if os.path.exists(path) and "--force" not in sys.argv:
+            print(f"✓ {name} (zaten var)")
+            continue
+        try:
+            with urllib.request.urlopen(url, timeout=30) as r:
+                text = r.read().decode("utf-8")
+        except Exception as e:
+            print(f"❌ {name}: {e}")
+            failed += 1
+            continue
+        atomic_write(path, lambda f: f.write(text))
+        print(f"✓ {name} ({len(text)} bayt)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()